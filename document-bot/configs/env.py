@@ -3,6 +3,29 @@ DOCUMENT_COLLECTION_NAME = 'documents'
 LECTURES_COLLECTION_NAME = 'lectures'
 
 DIMENSION = 384
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+# 'torch' runs the SentenceTransformer, 'onnx' runs the model exported by schemas/export_onnx.py with ONNX Runtime
+EMBEDDING_BACKEND = 'torch'
+# relative to the document-bot directory
+ONNX_MODEL_DIR = 'cache/onnx/all-MiniLM-L6-v2'
+ONNX_QUANTIZED = False
+# 0 lets ONNX Runtime pick one thread per physical core
+ONNX_INTRA_OP_THREADS = 0
+# entries are float32 vectors, about 1.6 KB each at 384 dimensions
+EMBEDDING_CACHE_SIZE = 10000
+INGEST_EMBEDDING_CACHE_SIZE = 2048
+# 0 encodes inside the API process, N starts N embedding worker processes fed through shared memory
+EMBEDDING_WORKERS = 0
+EMBEDDING_WORKER_THREADS = 1
+# workers that ingest may hold at once, None leaves one worker free for search
+EMBEDDING_POOL_INGEST_WORKERS = None
+EMBEDDING_POOL_INPUT_BYTES = 1048576
+EMBEDDING_POOL_START_TIMEOUT = 120
+# a worker still encoding one batch after this many seconds is restarted, None waits forever
+EMBEDDING_POOL_TASK_TIMEOUT = 120
+EMBEDDING_POOL_CHECK_INTERVAL = 0.5
+QUERY_BATCH_SIZE = 32
+QUERY_BATCH_WAIT_MS = 5
 
 # FIXME when running local
 MILVUS_HOST = '127.0.0.1'
@@ -12,9 +35,110 @@ BATCH_SIZE = 128
 TOP_K = 5
 COUNT = 10000
 
+# Index and search settings per collection and vector field, index_type is one of FLAT, IVF_FLAT, IVF_SQ8 or HNSW.
+# IVF nlist should stay around 4 * sqrt(rows), run schemas/index_benchmark.py before changing these.
+METRIC_TYPE = 'L2'
+INDEX_PARAMS = {
+    PROJECT_COLLECTION_NAME: {
+        'name_emb': {'index_type': 'IVF_FLAT', 'params': {'nlist': 16}},
+        'descr_emb': {'index_type': 'IVF_FLAT', 'params': {'nlist': 16}},
+    },
+    DOCUMENT_COLLECTION_NAME: {
+        'txt_emb': {'index_type': 'IVF_FLAT', 'params': {'nlist': 64}},
+    },
+    LECTURES_COLLECTION_NAME: {
+        'name_emb': {'index_type': 'IVF_FLAT', 'params': {'nlist': 128}},
+        'content_emb': {'index_type': 'IVF_FLAT', 'params': {'nlist': 128}},
+    },
+}
+COLLECTION_REFRESH_INTERVAL = 30
+# 'milvus' or 'local', the in-process store keeps each collection in memory-mapped files under LOCAL_STORE_DIR
+VECTOR_STORE = 'milvus'
+LOCAL_STORE_DIR = 'cache/vector_store'
+# seconds between background snapshots of changed local collections, close() always writes a final one
+LOCAL_STORE_FLUSH_INTERVAL = 5
+# the local store switches to an HNSW index past LOCAL_STORE_ANN_MIN_ROWS rows when hnswlib is installed
+LOCAL_STORE_ANN = True
+LOCAL_STORE_ANN_MIN_ROWS = 10000
+LOCAL_STORE_HNSW_M = 16
+LOCAL_STORE_HNSW_EF_CONSTRUCTION = 200
+# Search knobs per vector field, only the ones matching the field's index type in INDEX_PARAMS are used
+SEARCH_PARAMS = {
+    PROJECT_COLLECTION_NAME: {
+        'name_emb': {'nprobe': 4, 'ef': 32},
+        'descr_emb': {'nprobe': 4, 'ef': 32},
+    },
+    DOCUMENT_COLLECTION_NAME: {
+        'txt_emb': {'nprobe': 8, 'ef': 64},
+    },
+    LECTURES_COLLECTION_NAME: {
+        'name_emb': {'nprobe': 16, 'ef': 64},
+        'content_emb': {'nprobe': 16, 'ef': 64},
+    },
+}
+
+# loads the models and connects to the vector store before the API accepts requests, otherwise on first use
+WARM_UP_ON_STARTUP = True
+
+CPU_POOL_SIZE = 2
+CPU_QUEUE_DEPTH = 64
+IO_POOL_SIZE = 32
+IO_QUEUE_DEPTH = 256
+# seconds clients are asked to wait when a pool is full and the request is rejected with 503
+SATURATED_RETRY_AFTER = 1
+
 PROJECT_FILE_PATH = "../data/projects.csv"
 DOCUMENT_FILE_PATH = "../data/documents.csv"
 LECTURES_FILE_PATH = "../data/lectures.csv"
+LOADER_CHECKPOINT_DIR = "../cache/checkpoints"
+LOADER_WORKERS = 4
+# windows of LOADER_WORKERS * 16 rows prepared ahead of the one being encoded
+LOADER_PREFETCH_WINDOWS = 2
+# 'insert' streams batches through collection.insert, 'bulk_import' writes Parquet files and runs do_bulk_insert,
+# 'local' fills the in-process vector store under LOCAL_STORE_LOADER_DIR instead of Milvus
+LOADER_MODE = 'insert'
+BULK_IMPORT_DIR = "../cache/bulk_import"
+BULK_IMPORT_FILE_ROWS = 100000
+# 'minio' uploads the files to the bucket Milvus reads from, 'local' only writes them to BULK_IMPORT_DIR
+BULK_IMPORT_STORAGE = 'minio'
+BULK_IMPORT_MINIO_ENDPOINT = 'localhost:9000'
+BULK_IMPORT_MINIO_ACCESS_KEY = 'minioadmin'
+BULK_IMPORT_MINIO_SECRET_KEY = 'minioadmin'
+BULK_IMPORT_MINIO_BUCKET = 'a-bucket'
+BULK_IMPORT_POLL_INTERVAL = 2
+USE_EMBEDDING_ARTIFACTS = True
+EMBEDDING_ARTIFACT_DIR = "../cache/embeddings"
+EMBEDDING_ARTIFACT_SEGMENT_ROWS = 50000
+EMBEDDING_ARTIFACT_MAX_SEGMENTS = 16
+LOCAL_STORE_LOADER_DIR = "../cache/vector_store"
+INGEST_LEDGER_LOADER_PATH = "../cache/ingest.db"
+
+INFERENCE_API_URL = 'https://api-inference.huggingface.co/models'
+INFERENCE_TIMEOUT = 60
+INFERENCE_MAX_CONNECTIONS = 20
+INFERENCE_MAX_CONCURRENCY = 8
+INFERENCE_MAX_RETRIES = 4
+INFERENCE_BACKOFF_BASE = 0.5
+INFERENCE_BACKOFF_MAX = 30
+
+REPORT_MAX_CONCURRENCY = 8
+REPORTS_DIR = 'cache/reports'
+REPORT_WORKERS = 2
+REPORT_TTL = 3600
+REPORT_SWEEP_INTERVAL = 60
+REPORT_DISCONNECT_POLL_INTERVAL = 0.5
+
+SUMMARY_CACHE_PATH = 'cache/summaries.db'
+SUMMARY_CACHE_SIZE = 1024
+INGEST_LEDGER_PATH = 'cache/ingest.db'
 
 KAFKA_BROKER = 'localhost:9092'
-# KAFKA_BROKER = 'kafka'
\ No newline at end of file
+# KAFKA_BROKER = 'kafka'
+KAFKA_CONSUMER_WORKERS = 4
+KAFKA_MAX_IN_FLIGHT = 256
+KAFKA_CONSUME_BATCH_SIZE = 50
+KAFKA_METRICS_INTERVAL = 30
+KAFKA_LINGER_MS = 5
+KAFKA_PRODUCER_BATCH_SIZE = 65536
+KAFKA_COMPRESSION_TYPE = 'lz4'
+KAFKA_FLUSH_TIMEOUT = 10
\ No newline at end of file
@@ -1,8 +1,27 @@
+import time
+
+process_started = time.perf_counter()
+
+import asyncio
+import logging
 from threading import Thread
-import uvicorn
-from fastapi import FastAPI
-from routers import documents, lectures, projects, reports
-from services.kafka_consumer import create_consumer, consume_messages
+
+from services.startup import log_startup_breakdown, timed
+
+with timed('imports'):
+    import configs.env as env
+    import uvicorn
+    from fastapi import FastAPI
+    from fastapi.responses import JSONResponse
+    from routers import documents, health, lectures, projects, reports
+    from services.embedding_service import shutdown_embeddings, warm_up
+    from services.executor_service import ExecutorSaturated, io_executor, shutdown_executors
+    from services.inference_service import inference_client
+    from services.kafka_producer import flush_producer
+    from services.kafka_consumer import create_consumer, consume_messages
+    from services.milvus_service import client
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -10,10 +29,39 @@ app.include_router(projects.router)
 app.include_router(documents.router)
 app.include_router(lectures.router)
 app.include_router(reports.router)
+app.include_router(health.router)
+
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated(request, exc):
+    return JSONResponse(content={"error": str(exc)}, status_code=503,
+                        headers={"Retry-After": str(env.SATURATED_RETRY_AFTER)})
+
+@app.on_event("startup")
+async def startup():
+    reports.report_jobs.start()
+    if env.WARM_UP_ON_STARTUP:
+        await asyncio.gather(io_executor.run(warm_up), io_executor.run(connect_vector_store))
+    log_startup_breakdown(time.perf_counter() - process_started)
+
+@app.on_event("shutdown")
+async def shutdown():
+    if client.initialized():
+        client.close()
+    await inference_client.close()
+    await reports.report_jobs.close()
+    shutdown_executors()
+    shutdown_embeddings()
+    flush_producer()
+
+def connect_vector_store():
+    try:
+        client()
+    except Exception:
+        logger.exception('Vector store is not reachable yet, it will be connected on first use')
 
 def start_kafka_consumer():
-    consumer = create_consumer('document-bot-success')
-    consume_messages(consumer)
+    consumer = create_consumer()
+    consume_messages(consumer, 'document-bot-success')
 
 
 if __name__ == '__main__':
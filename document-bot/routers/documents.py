@@ -1,19 +1,24 @@
 import io
-import os
 import re
 from datetime import datetime
+from typing import List
 
 import pymupdf
-import requests
 from configs.env import DOCUMENT_COLLECTION_NAME
 from fastapi import APIRouter, File, Form, UploadFile
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from services.embedding_service import chunk, embed_insert, embed_search
+from schemas.collection_specs import DOCUMENTS, ColumnBuffer
+from services.embedding_service import (chunk, content_hash, embed_chunk_batches,
+                                        embed_chunks, embed_search)
 from services.event_service import (EEventSource, ESagaStatus, Event, History,
                                     to_json)
-from services.kafka_producer import create_producer
-from services.milvus_service import client
+from services.executor_service import ExecutorSaturated, io_executor
+from services.inference_service import inference_client
+from services.ingest_ledger import ingest_ledger
+from services.kafka_producer import produce
+from services.milvus_service import client, insert_columns
+from services.summary_cache import summary_cache
 
 router = APIRouter()
 
@@ -44,24 +49,18 @@ class VectorAskRequest(BaseModel):
     document_id: int
     version: int
 
-class Vector(BaseModel):
-    project_id: int
-    document_id: int
-    name: str
-    version: int
-    text: str
-    chunk_id: int
-    txt_emb: list
-
 class NoVersionFound(Exception):
     pass
 
+class EmptyDocument(Exception):
+    pass
+
 collection_name = DOCUMENT_COLLECTION_NAME
 
 @router.get("/test-milvus-connection/")
 async def test_milvus_connection():
     try:
-        status = client.get_collection_stats(collection_name="documents")
+        status = await io_executor.run(client.call, 'get_collection_stats', collection_name="documents")
         return {"message": "Connected to Milvus", "status": status}
     except Exception as e:
         return {"message": "Error occurred during Milvus connection:", "error": str(e)}
@@ -72,7 +71,7 @@ async def create(
     project_id: int = Form(...),
     document_id: int = Form(...),
     name: str = Form(...),
-    version: str = Form(...),
+    version: int = Form(...),
     text: str = Form(None),
     file: UploadFile = File(None)
 ):
@@ -81,22 +80,18 @@ async def create(
             return JSONResponse(content={"message": "Either 'text' or 'file' must be provided"}, status_code=400)        
             
         if file and file.filename.endswith(".pdf"):
-            text = pdf_to_text(file)
-
-        for chunk_id, chunk_txt in chunk(text):
-            vector = Vector(
-                project_id=project_id,
-                document_id=document_id,
-                name=name,
-                version=version,
-                text=chunk_txt,
-                chunk_id=chunk_id,
-                txt_emb=embed_insert(chunk_txt)
-            )
-            client.insert(collection_name=collection_name, data=vector.dict())
-        
+            text = await io_executor.run(pdf_to_text, file)
+
+        await io_executor.run(insert_document, project_id, document_id, name, version, text)
+
         return JSONResponse(content={"message": "Vector(s) successfully created."}, status_code=201)
-    
+
+    except EmptyDocument as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+    except ExecutorSaturated:
+        raise
+
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
@@ -104,7 +99,7 @@ async def create(
 @router.get("/api/v1/collections/documents/{vector_id}", response_model=VectorResponse)
 async def get(vector_id: int):
     try:
-        vector_data = client.get(collection_name=collection_name, ids=vector_id)
+        vector_data = await io_executor.run(client.call, 'get', collection_name=collection_name, ids=vector_id)
         if vector_data:
             vector = vector_data[0]
             return VectorResponse(
@@ -119,15 +114,21 @@ async def get(vector_id: int):
         else:
             return JSONResponse(content={"message": "Vector not found"}, status_code=404)
         
+    except ExecutorSaturated:
+        raise
+
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)   
     
 @router.delete("/api/v1/collections/documents/{vector_id}")
 async def delete(vector_id: int):
     try:
-        client.delete(collection_name=collection_name, pks=vector_id)
+        await io_executor.run(delete_vector, vector_id)
         return JSONResponse(content={"message": f"Vector with ID {vector_id} successfully deleted."}, status_code=200)
    
+    except ExecutorSaturated:
+        raise
+
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)
     
@@ -135,12 +136,15 @@ async def delete(vector_id: int):
 @router.post("/api/v1/collections/documents/summarize")
 async def summarize(summarize_req: VectorSummarizeRequest):
     try:
-        return summarize_document(summarize_req.project_id, 
-                                  summarize_req.document_id,
-                                  summarize_req.version)        
+        return await summarize_document(summarize_req.project_id,
+                                        summarize_req.document_id,
+                                        summarize_req.version)
     except NoVersionFound as e:
         return JSONResponse(content={"error": str(e)}, status_code=404) 
     
+    except ExecutorSaturated:
+        raise
+
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500) 
     
@@ -148,10 +152,13 @@ async def summarize(summarize_req: VectorSummarizeRequest):
 @router.post("/api/v1/collections/documents/ask")
 async def find(ask_req: VectorAskRequest):
     try:
-        return answer_question(ask_req.question,
-                               ask_req.project_id, 
-                               ask_req.document_id,
-                               ask_req.version)  
+        return await answer_question(ask_req.question,
+                                     ask_req.project_id,
+                                     ask_req.document_id,
+                                     ask_req.version)
+    except ExecutorSaturated:
+        raise
+
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)   
 
@@ -168,6 +175,96 @@ def pdf_to_text(file: UploadFile):
     except Exception as e:
         return JSONResponse(content={"error processing pdf": str(e)}, status_code=400)   
 
+def version_filter(project_id, document_id, version):
+    return f'project_id == {int(project_id)} and document_id == {int(document_id)} and version == {int(version)}'
+
+def version_exists(project_id, document_id, version):
+    return bool(client.query(collection_name=collection_name, filter=version_filter(project_id, document_id, version),
+                             output_fields=["id"], limit=1))
+
+def already_ingested(event: Event):
+    # The ledger only records what was written, a version deleted or rebuilt since then has to be ingested again
+    payload = event.payload
+    if not ingest_ledger.contains(event.transactionId, payload.projectId, payload.documentId, payload.version):
+        return False
+    if version_exists(payload.projectId, payload.documentId, payload.version):
+        return True
+    ingest_ledger.forget(payload.projectId, payload.documentId, payload.version)
+    return False
+
+def find_chunk_ids(filter):
+    return [result['id'] for result in client.query(collection_name=collection_name, filter=filter, output_fields=["id"])]
+
+def delete_chunks(chunk_ids):
+    if chunk_ids:
+        client.delete(collection_name=collection_name, pks=chunk_ids)
+
+def document_filter(project_id, document_id):
+    return f'project_id == {int(project_id)} and document_id == {int(document_id)}'
+
+def find_base_version(project_id, document_id, version):
+    # The version being replaced, or else the latest one before it, is the text an update is most likely based on
+    if version_exists(project_id, document_id, version):
+        return int(version)
+    older = client.query(collection_name=collection_name,
+                         filter=f'{document_filter(project_id, document_id)} and version < {int(version)}',
+                         output_fields=["version"])
+    return max((result['version'] for result in older), default=None)
+
+def find_known_embeddings(versions, data_chunks):
+    wanted = {chunk_hash for _, _, chunk_hash in data_chunks}
+    bases = {(version[0], version[1], find_base_version(*version)) for version in versions}
+    bases = [base for base in bases if base[2] is not None]
+    if not bases:
+        return {}
+
+    # Match texts first and fetch one vector per distinct hash instead of every vector of the base versions
+    hash_ids = {}
+    for result in client.query(collection_name=collection_name, output_fields=["id", "text"],
+                               filter=' or '.join(f'({version_filter(*base)})' for base in bases)):
+        chunk_hash = content_hash(result['text'])
+        if chunk_hash in wanted:
+            hash_ids.setdefault(chunk_hash, result['id'])
+    if not hash_ids:
+        return {}
+    id_hashes = {pk: chunk_hash for chunk_hash, pk in hash_ids.items()}
+    return {
+        id_hashes[result['id']]: result['txt_emb']
+        for result in client.get(collection_name=collection_name, ids=list(id_hashes), output_fields=["txt_emb"])
+    }
+
+def chunk_document(document_id, version, text):
+    data_chunks = chunk(text or '')
+    if not data_chunks:
+        raise EmptyDocument(f"Document {document_id} version {version} has no text to index")
+    return data_chunks
+
+def insert_document(project_id, document_id, name, version, text):
+    project_id, document_id, version = int(project_id), int(document_id), int(version)
+    # Chunk before touching the store so an empty text never deletes the version it was meant to replace
+    data_chunks = chunk_document(document_id, version, text)
+    existing_ids = find_chunk_ids(version_filter(project_id, document_id, version))
+    known_embeddings = find_known_embeddings([(project_id, document_id, version)], data_chunks)
+    buffer = ColumnBuffer(DOCUMENTS.insert_fields)
+    for chunk_ids, chunk_txts, txt_embs in embed_chunk_batches(data_chunks, known_embeddings=known_embeddings):
+        buffer.extend({'chunk_id': chunk_ids, 'text': chunk_txts, 'txt_emb': txt_embs},
+                      project_id=project_id,
+                      document_id=document_id,
+                      name=name,
+                      version=version)
+        insert_columns(collection_name, buffer.take())
+    delete_chunks(existing_ids)
+    summary_cache.invalidate(project_id, document_id, version)
+    ingest_ledger.forget(project_id, document_id, version)
+
+def delete_vector(vector_id):
+    vector_data = client.get(collection_name=collection_name, ids=vector_id,
+                             output_fields=["project_id", "document_id", "version"])
+    client.delete(collection_name=collection_name, pks=vector_id)
+    for vector in vector_data:
+        summary_cache.invalidate(vector["project_id"], vector["document_id"], vector["version"])
+        ingest_ledger.forget(vector["project_id"], vector["document_id"], vector["version"])
+
 def find_documents_by_project(project_id):
     query_results = client.query(
         collection_name=collection_name,
@@ -186,22 +283,27 @@ def find_documents_by_project(project_id):
     return documents
 
 def find_chunks_by_version(project_id, document_id, version):
-    return client.query(
+    chunks = client.query(
         collection_name=collection_name,
-        filter=f'project_id == {project_id} and document_id == {document_id} and version == {version}',
-        output_fields=["chunk_id", "text"],
-        sort_by="chunk_id"
-    )   
+        filter=version_filter(project_id, document_id, version),
+        output_fields=["chunk_id", "text"]
+    )
+    return sorted(chunks, key=lambda chunk: chunk['chunk_id'])
+
+async def summarize_document(project_id, document_id, version, prompt = 'Summarize the following document:'):
+    summary = await io_executor.run(summary_cache.get, project_id, document_id, version, prompt)
+    if summary is not None:
+        return summary
 
-def summarize_document(project_id, document_id, version, prompt = 'Summarize the following document:'):
-    chunks = find_chunks_by_version(project_id, document_id, version)
+    chunks = await io_executor.run(find_chunks_by_version, project_id, document_id, version)
     
     if len(chunks) == 0:
         raise NoVersionFound(f"No vectors found for version {version}, document ID {document_id}, and project ID {project_id}")
 
     context = "".join(chunk['text'] for chunk in chunks)
 
-    summary = run_bert_prompt(prompt, context)
+    summary = await run_bert_prompt(prompt, context)
+    await io_executor.run(summary_cache.put, project_id, document_id, version, prompt, summary)
     return summary
 
 def find_answer_by_version(question, project_id, document_id, version):
@@ -210,44 +312,38 @@ def find_answer_by_version(question, project_id, document_id, version):
     return client.search(
         collection_name=collection_name,
         data=text_vector,
-        filter=f'project_id == {project_id} and document_id == {document_id} and version == {version}',
+        anns_field="txt_emb",
+        filter=version_filter(project_id, document_id, version),
+        search_params=DOCUMENTS.search_params("txt_emb"),
         output_fields=["text"],
         limit=3
     )
 
-def answer_question(prompt, project_id, document_id, version):
-    chunks = find_answer_by_version(prompt, project_id, document_id, version)
+async def answer_question(prompt, project_id, document_id, version):
+    chunks = await io_executor.run(find_answer_by_version, prompt, project_id, document_id, version)
 
     if len(chunks) == 0:
         raise NoVersionFound(f"No vectors found for version {version}, document ID {document_id}, and project ID {project_id}")
 
     context = "".join(chunk[0]['entity']['text'] for chunk in chunks)
 
-    summary = run_llama_prompt(prompt, context)
+    summary = await run_llama_prompt(prompt, context)
     return summary
 
-def run_bert_prompt(query, context):
-    api_url = "https://api-inference.huggingface.co/models/facebook/bart-large-cnn"
-    api_token = os.environ['DOCUBOT_ACCESS_TOKEN']
-    headers = {"Authorization": f"Bearer {api_token}"}
-
+async def run_bert_prompt(query, context):
     prompt = f"{query}\n{context}"
     data = {
         "inputs": prompt,
         "parameters": {"max_length": 500, "min_length": 30, "do_sample": False}
     }
 
-    response = requests.post(api_url, headers=headers, json=data)
+    response = await inference_client.post("facebook/bart-large-cnn", data)
     if response.status_code == 200:
         return response.json()[0]['summary_text']
         
     raise Exception(f"API request failed with status code {response.status_code}: {response.text}")
     
-def run_llama_prompt(query, context):
-    api_url = "https://api-inference.huggingface.co/models/meta-llama/Meta-Llama-3-8B-Instruct"
-    api_token = os.environ['DOCUBOT_ACCESS_TOKEN']
-    headers = {"Authorization": f"Bearer {api_token}"}
-
+async def run_llama_prompt(query, context):
     prompt = f"{query}\nContext: {context}"
     message = f"<|begin_of_text|><|start_header_id|>system<|end_header_id|>'Answer based on context.'<|eot_id|><|start_header_id|>user<|end_header_id|>{prompt}<|eot_id|><|start_header_id|>assistant<|end_header_id|>"
     data = {
@@ -255,7 +351,7 @@ def run_llama_prompt(query, context):
         "parameters": {"max_seq_len ": 2048, "temperature": 0.1, "max_batch_size": 12}
     }
 
-    response = requests.post(api_url, headers=headers, json=data)
+    response = await inference_client.post("meta-llama/Meta-Llama-3-8B-Instruct", data)
     if response.status_code == 200:
         generated_text = response.json()[0]['generated_text']
         response_text = generated_text.split('<|end_header_id|>\n\n')[1]
@@ -278,19 +374,13 @@ def saga_create(
         if not event.payload.text:
             return JSONResponse(content={"message": "Either 'text' or 'file' must be provided"}, status_code=400)        
 
-        for chunk_id, chunk_txt in chunk(event.payload.text):
-            vector = Vector(
-                project_id=event.payload.projectId,
-                document_id=event.payload.documentId,
-                name=event.payload.name,
-                version=event.payload.version,
-                text=chunk_txt,
-                chunk_id=chunk_id,
-                txt_emb=embed_insert(chunk_txt)
-            )
-            client.insert(collection_name=collection_name, data=vector.dict())
+        payload = event.payload
+        if already_ingested(event):
+            handle_success(event)
+            return
 
-        
+        insert_document(payload.projectId, payload.documentId, payload.name, payload.version, payload.text)
+        ingest_ledger.record(event.transactionId, payload.projectId, payload.documentId, payload.version)
 
         handle_success(event)
         
@@ -298,9 +388,63 @@ def saga_create(
     except Exception as e:
         handle_error(event, str(e))
 
-def handle_success(event: Event):
-    producer = create_producer()
+def saga_create_batch(events: List[Event]):
+    prepared = []
+    duplicates = []
+    versions = set()
+    for event in events:
+        if not event.payload or not event.payload.text:
+            saga_create(event)
+            continue
+        try:
+            payload = event.payload
+            version = (int(payload.projectId), int(payload.documentId), int(payload.version))
+            if version in versions or already_ingested(event):
+                duplicates.append(event)
+                continue
+            prepared.append((event, chunk_document(version[1], version[2], payload.text)))
+            versions.add(version)
+        except Exception as e:
+            handle_error(event, str(e))
+
+    if not prepared:
+        for event in duplicates:
+            saga_create(event)
+        return
 
+    try:
+        existing_ids = find_chunk_ids(' or '.join(f'({version_filter(*version)})' for version in versions))
+        batch_chunks = [data_chunk for _, data_chunks in prepared for data_chunk in data_chunks]
+        known_embeddings = find_known_embeddings(versions, batch_chunks)
+        buffer = ColumnBuffer(DOCUMENTS.insert_fields)
+        for event, data_chunks in prepared:
+            buffer.extend({'chunk_id': [chunk_id for chunk_id, _, _ in data_chunks],
+                           'text': [chunk_txt for _, chunk_txt, _ in data_chunks]},
+                          project_id=int(event.payload.projectId),
+                          document_id=int(event.payload.documentId),
+                          name=event.payload.name,
+                          version=int(event.payload.version))
+        columns = buffer.take()
+        columns['txt_emb'] = embed_chunks(batch_chunks, known_embeddings)
+        insert_columns(collection_name, columns)
+        delete_chunks(existing_ids)
+    except Exception:
+        # Retry one event at a time so a single bad payload only rolls back its own saga
+        for event, _ in prepared + [(event, None) for event in duplicates]:
+            saga_create(event)
+        return
+
+    for event, _ in prepared:
+        payload = event.payload
+        summary_cache.invalidate(payload.projectId, payload.documentId, payload.version)
+        ingest_ledger.forget(payload.projectId, payload.documentId, payload.version)
+        ingest_ledger.record(event.transactionId, payload.projectId, payload.documentId, payload.version)
+        handle_success(event)
+
+    for event in duplicates:
+        saga_create(event)
+
+def handle_success(event: Event):
     event.status = ESagaStatus.SUCCESS
     event.source = EEventSource.DOCUMENT_BOT_SERVICE
     event.eventHistory.append(
@@ -312,14 +456,10 @@ def handle_success(event: Event):
         )
     )
 
-    producer.produce('orchestrator', value=to_json(event))
-    producer.poll(0)
-    producer.flush()
+    produce('orchestrator', to_json(event))
 
 
 def handle_error(event: Event, message: str):
-    producer = create_producer()
-
     event.status = ESagaStatus.ROLLBACK_PENDING
     event.source = EEventSource.DOCUMENT_BOT_SERVICE
     event.eventHistory.append(
@@ -331,6 +471,4 @@ def handle_error(event: Event, message: str):
         )
     )
 
-    producer.produce('orchestrator', value=to_json(event))
-    producer.poll(0)
-    producer.flush()
\ No newline at end of file
+    produce('orchestrator', to_json(event))
\ No newline at end of file
@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from services.embedding_service import embedding_stats
+from services.kafka_consumer import consumer_metrics
+from services.kafka_producer import producer_metrics
+from services.milvus_service import client
+
+router = APIRouter()
+
+@router.get("/api/v1/health")
+async def health():
+    return {"status": "ok"}
+
+@router.get("/api/v1/health/ready")
+async def ready():
+    is_ready = client.initialized() and client.ready()
+    collections = client.status() if client.initialized() else {}
+    content = {"status": "ready" if is_ready else "loading", "collections": collections}
+    return JSONResponse(content=content, status_code=200 if is_ready else 503)
+
+@router.get("/api/v1/health/metrics")
+async def metrics():
+    return {"embeddings": embedding_stats(), "kafka_producer": producer_metrics(),
+            "kafka_consumer": consumer_metrics()}
@@ -2,8 +2,11 @@ from configs.env import PROJECT_COLLECTION_NAME
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from pymilvus import AnnSearchRequest, Collection, WeightedRanker
-from services.embedding_service import embed_insert, embed_search
+from pymilvus import WeightedRanker
+from schemas.collection_specs import PROJECTS
+from services.embedding_service import embed_batch, embed_search
+from services.collection_manager import CollectionNotReady
+from services.executor_service import ExecutorSaturated, io_executor
 from services.milvus_service import client
 
 router = APIRouter()
@@ -51,24 +54,17 @@ class Vector(BaseModel):
     descr_emb: list
 
 collection_name = PROJECT_COLLECTION_NAME
-collection = Collection(name=PROJECT_COLLECTION_NAME)
 
 # FEAT: CRUD
 @router.post("/api/v1/collections/projects")
 async def create(project: VectorCreateRequest):
     try:
-        vector = Vector(
-            id=project.id,
-            name=project.name,
-            description=project.description,
-            budget=project.budget,
-            type=project.type,
-            name_emb=embed_insert(project.name),
-            descr_emb=embed_insert(project.description)
-        )
-        client.insert(collection_name=collection_name, data=vector.dict())
+        await io_executor.run(insert_project, project.id, project)
         return JSONResponse(content={"message": f"Vector successfully created."}, status_code=201)
     
+    except ExecutorSaturated:
+        raise
+
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
@@ -76,7 +72,7 @@ async def create(project: VectorCreateRequest):
 @router.get("/api/v1/collections/projects/{vector_id}", response_model=VectorResponse)
 async def get(vector_id: int):
     try:
-        vector_data = client.get(collection_name=collection_name, ids=vector_id)
+        vector_data = await io_executor.run(client.call, 'get', collection_name=collection_name, ids=vector_id)
         if vector_data:
             vector = vector_data[0]
             return VectorResponse(
@@ -89,33 +85,33 @@ async def get(vector_id: int):
         else:
             return JSONResponse(content={"message": "Vector not found"}, status_code=404)
         
+    except ExecutorSaturated:
+        raise
+
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)   
     
 @router.put("/api/v1/collections/projects/{vector_id}")
 async def update(vector_id: int, project: VectorUpdateRequest):
     try:
-        vector_data = Vector(
-            id=vector_id,
-            name=project.name,
-            description=project.description,
-            budget=project.budget,
-            type=project.type,
-            name_emb=embed_insert(project.name),
-            descr_emb=embed_insert(project.description)
-        )
-        client.upsert(collection_name=collection_name, vector_id=vector_id, data=vector_data.dict())
+        await io_executor.run(upsert_project, vector_id, project)
         return JSONResponse(content={"message": f"Vector with ID {vector_id} successfully updated."}, status_code=200)
     
+    except ExecutorSaturated:
+        raise
+
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
 @router.delete("/api/v1/collections/projects/{vector_id}")
 async def delete(vector_id: int):
     try:
-        client.delete(collection_name=collection_name, pks=vector_id)
+        await io_executor.run(client.call, 'delete', collection_name=collection_name, pks=vector_id)
         return JSONResponse(content={"message": f"Vector with ID {vector_id} successfully deleted."}, status_code=200)
    
+    except ExecutorSaturated:
+        raise
+
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
@@ -123,8 +119,12 @@ async def delete(vector_id: int):
 @router.post("/api/v1/collections/projects/search")
 async def search(search_req: VectorSearchRequest):
     try:
-        return hybrid_search(search_req.search_term)
+        return await io_executor.run(hybrid_search, search_req.search_term)
         
+    except CollectionNotReady as e:
+        return JSONResponse(content={"error": str(e)}, status_code=503)
+    except ExecutorSaturated:
+        raise
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)   
 
@@ -132,10 +132,14 @@ async def search(search_req: VectorSearchRequest):
 @router.post("/api/v1/collections/projects/filter")
 async def filter(filter_req: VectorFilterRequest):
     try:
-        return filter_search(filter_req.description, 
-                                    filter_req.lower_budget, 
-                                    filter_req.upper_budget, 
-                                    filter_req.type)
+        return await io_executor.run(filter_search,
+                                     filter_req.description,
+                                     filter_req.lower_budget,
+                                     filter_req.upper_budget,
+                                     filter_req.type)
+    except ExecutorSaturated:
+        raise
+
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)  
      
@@ -143,45 +147,46 @@ async def filter(filter_req: VectorFilterRequest):
 @router.post("/api/v1/collections/projects/iterate")
 async def iterate(iterate_req: VectorIterateRequest):
     try:
-        return iterator_filter(iterate_req.name, iterate_req.budget)
+        return await io_executor.run(iterator_filter, iterate_req.name, iterate_req.budget)
     
+    except ExecutorSaturated:
+        raise
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500) 
     
+def project_vector(vector_id, project):
+    name_emb, descr_emb = embed_batch([project.name, project.description])
+    return Vector(
+        id=vector_id,
+        name=project.name,
+        description=project.description,
+        budget=project.budget,
+        type=project.type,
+        name_emb=name_emb,
+        descr_emb=descr_emb
+    )
+
+def insert_project(vector_id, project):
+    client.insert(collection_name=collection_name, data=project_vector(vector_id, project).dict())
+
+def upsert_project(vector_id, project):
+    client.upsert(collection_name=collection_name, data=project_vector(vector_id, project).dict())
+
 def hybrid_search(search_term: str):
     searh_vector = embed_search(search_term)
 
-    search_param_1 = {
-        "data":searh_vector,
-        "anns_field":"name_emb",
-        "param":{
-            "metric_type": "L2",
-            "params": {"nprobe": 10}
-        }, 
-        "limit":5
-    }      
-    request_1 = AnnSearchRequest(**search_param_1)
-
-    search_param_2 = {
-        "data":searh_vector,
-        "anns_field":"descr_emb",
-        "param":{
-            "metric_type": "L2",
-            "params": {"nprobe": 10}
-        }, 
-        "limit":5
-    }
-    request_2 = AnnSearchRequest(**search_param_2)
+    request_1 = PROJECTS.ann_request(searh_vector, "name_emb", limit=5)
+    request_2 = PROJECTS.ann_request(searh_vector, "descr_emb", limit=5)
 
     reqs = [request_1, request_2]
     rerank = WeightedRanker(0.4, 0.6)  
 
-    collection.load()
-    res = collection.hybrid_search(
+    res = client.hybrid_search(
+        collection_name,
         reqs, 
         rerank,
         limit=3, 
-        output_fields=['name', 'description', 'budget', 'type']
+        output_fields=PROJECTS.output_fields
     )
     return res
 
@@ -193,32 +198,20 @@ def filter_search(description, lower_budget, upper_budget, type):
         data=descr_vector,
         anns_field="descr_emb",
         filter=f'{lower_budget} <= budget <= {upper_budget} and type == "{type}"',
-        output_fields=['name', 'description', 'budget', 'type'],
+        output_fields=PROJECTS.output_fields,
+        search_params=PROJECTS.search_params("descr_emb"),
         limit=10
     )
 
 def iterator_filter(name, budget):    
     name_vector = embed_search(name)
 
-    collection.load()
-    iterator = collection.query_iterator(
+    return client.search(
+        collection_name=collection_name,
         data=name_vector,
-        anns_field="name_emb",    
-        batch_size=5,
-        limit=15, 
-        expr=f'budget < {budget} and type == "INTERNAL"',
-        output_fields=["name", "description", "type"]
-    )   
-
-    results = []
-    while True:
-        result = iterator.next()
-
-        if len(result) == 0:
-            iterator.close()
-            break;
-        
-        for x in range(len(result)):
-            results.append(result[x])
-
-    return results
+        anns_field="name_emb",
+        filter=f'budget < {int(budget)} and type == "INTERNAL"',
+        output_fields=["name", "description", "type"],
+        search_params=PROJECTS.search_params("name_emb"),
+        limit=15
+    )[0]
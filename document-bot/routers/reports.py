@@ -1,12 +1,21 @@
-import io
+import asyncio
+import json
+import os
+import re
+import uuid
 from typing import Optional
 
-from fastapi import APIRouter, Query
-from fastapi.responses import StreamingResponse
+from configs.env import (REPORT_DISCONNECT_POLL_INTERVAL, REPORT_MAX_CONCURRENCY,
+                         REPORT_SWEEP_INTERVAL, REPORT_TTL, REPORT_WORKERS, REPORTS_DIR)
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from fpdf import FPDF
 from pydantic import BaseModel
 from routers.documents import find_documents_by_project, summarize_document
 from routers.projects import hybrid_search
+from services.executor_service import io_executor
+from services.report_service import ReportJobQueue
 
 router = APIRouter()
 
@@ -63,13 +72,86 @@ class PDF(FPDF):
 
 @router.get("/api/v1/reports")
 async def report(search_term: str = Query(..., description="Term to search projects")):
-    pdf_buffer = io.BytesIO(create_pdf(search_term))
-
-    return StreamingResponse(pdf_buffer, 
-                             media_type='application/pdf', 
-                             headers={"Content-Disposition": "attachment; filename=report.pdf"})
-
-def create_pdf(search_term):
+    path = await create_pdf(search_term, report_path(uuid.uuid4().hex))
+
+    return FileResponse(path,
+                        media_type='application/pdf',
+                        filename='report.pdf',
+                        background=BackgroundTask(os.remove, path))
+
+@router.get("/api/v1/reports/stream")
+async def report_stream(request: Request, search_term: str = Query(..., description="Term to search projects")):
+    return StreamingResponse(stream_report(search_term, request), media_type='application/x-ndjson')
+
+@router.post("/api/v1/reports/jobs")
+async def submit_report_job(search_term: str = Query(..., description="Term to search projects")):
+    job_id, status = report_jobs.submit(search_term)
+    return JSONResponse(content={"job_id": job_id, "status": status}, status_code=202)
+
+@router.get("/api/v1/reports/jobs/{job_id}")
+async def report_job(job_id: str):
+    status = report_jobs.poll(job_id) if re.fullmatch(r'[0-9a-f]{64}', job_id) else None
+    if status is None:
+        return JSONResponse(content={"message": "Report job not found"}, status_code=404)
+    if status == 'done':
+        return FileResponse(report_jobs.path(job_id), media_type='application/pdf', filename='report.pdf')
+    if status == 'failed':
+        return JSONResponse(content={"job_id": job_id, "status": status, "error": report_jobs.error(job_id)}, status_code=500)
+
+    return JSONResponse(content={"job_id": job_id, "status": status}, status_code=202)
+
+@router.get("/api/v1/reports/files/{report_id}")
+async def report_file(report_id: str):
+    if not re.fullmatch(r'[0-9a-f]{32}', report_id) or not os.path.exists(report_path(report_id)):
+        return JSONResponse(content={"message": "Report not found"}, status_code=404)
+
+    path = report_path(report_id)
+    return FileResponse(path,
+                        media_type='application/pdf',
+                        filename='report.pdf',
+                        background=BackgroundTask(os.remove, path))
+
+def report_path(report_id):
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    return os.path.join(REPORTS_DIR, f'{report_id}.pdf')
+
+def discard_report(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+async def stream_report(search_term, request=None):
+    report_id = uuid.uuid4().hex
+    path = report_path(report_id)
+    progress = asyncio.Queue()
+    task = asyncio.ensure_future(create_pdf(search_term, path, progress))
+    task.add_done_callback(lambda _: progress.put_nowait(None))
+    delivered = False
+
+    try:
+        while True:
+            if request is not None and await request.is_disconnected():
+                return
+            try:
+                event = await asyncio.wait_for(progress.get(), REPORT_DISCONNECT_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                continue
+            if event is None:
+                break
+            yield json.dumps(event) + '\n'
+
+        try:
+            task.result()
+            yield json.dumps({'event': 'done', 'report_id': report_id, 'download': f'/api/v1/reports/files/{report_id}'}) + '\n'
+            delivered = True
+        except Exception as e:
+            yield json.dumps({'event': 'error', 'error': str(e)}) + '\n'
+    finally:
+        if not delivered:
+            # The client disconnected before it was told where to download the report, nobody will fetch it
+            task.cancel()
+            task.add_done_callback(lambda _: discard_report(path))
+
+async def create_pdf(search_term, path, progress=None):
     pdf = PDF()
     pdf.add_page()
 
@@ -81,36 +163,66 @@ def create_pdf(search_term):
     )    
 
     pdf.add_paragraph(intro_paragraph)
-    generate_content(pdf, search_term)
+    await generate_content(pdf, search_term, progress)
 
-    return pdf.output(dest='S').encode('latin-1')
+    await io_executor.run(pdf.output, path, 'F')
+    return path
 
-def generate_content(pdf, search_term):    
+async def generate_content(pdf, search_term, progress=None):
     # FEAT REPORT SECTION 1 (COMPLEX)
-    projects = hybrid_search(search_term)[0]
-    for index, result in enumerate(projects, start=1):
-        project = Project(
+    results = (await io_executor.run(hybrid_search, search_term))[0]
+    projects = [
+        Project(
             id=result.id,
             name=result.entity.get('name'),
             description=result.entity.get('description'),
             budget=result.entity.get('budget'),
             type=result.entity.get('type')
         )
+        for result in results
+    ]
+
+    if progress is not None:
+        await progress.put({'event': 'projects', 'count': len(projects)})
+
+    semaphore = asyncio.Semaphore(REPORT_MAX_CONCURRENCY)
+    project_documents = await asyncio.gather(*(collect_documents(project, semaphore, progress) for project in projects))
+
+    for index, (project, documents) in enumerate(zip(projects, project_documents), start=1):
         pdf.add_project_section(index, project)
 
         pdf.add_title('Documentation:')
-        # FEAT REPORT SECTION 2 (SIMPLE)
-        documents = find_documents_by_project(project.id)
-        for result in documents:
-            document = Document(
-                project_id=result.get('project_id'),
-                document_id=result.get('document_id'),
-                version=result.get('version'),
-                name=result.get('name')
-            )
-
-            # FEAT REPORT SECTION 3 (SIMPLE)
-            document.summary = summarize_document(document.project_id, 
-                                                     document.document_id, 
-                                                     document.version)
-            pdf.add_document_section(document)
\ No newline at end of file
+        for document in documents:
+            pdf.add_document_section(document)
+
+async def collect_documents(project, semaphore, progress=None):
+    # FEAT REPORT SECTION 2 (SIMPLE)
+    async with semaphore:
+        results = await io_executor.run(find_documents_by_project, project.id)
+
+    documents = [
+        Document(
+            project_id=result.get('project_id'),
+            document_id=result.get('document_id'),
+            version=result.get('version'),
+            name=result.get('name')
+        )
+        for result in results
+    ]
+    if progress is not None:
+        await progress.put({'event': 'project', 'project_id': project.id, 'name': project.name, 'documents': len(documents)})
+
+    await asyncio.gather(*(summarize(document, semaphore, progress) for document in documents))
+    return documents
+
+async def summarize(document, semaphore, progress=None):
+    # FEAT REPORT SECTION 3 (SIMPLE)
+    async with semaphore:
+        document.summary = await summarize_document(document.project_id,
+                                                    document.document_id,
+                                                    document.version)
+    if progress is not None:
+        await progress.put({'event': 'document', 'project_id': document.project_id, 'document_id': document.document_id,
+                            'version': document.version, 'name': document.name})
+
+report_jobs = ReportJobQueue(create_pdf, REPORTS_DIR, REPORT_WORKERS, REPORT_TTL, REPORT_SWEEP_INTERVAL)
@@ -0,0 +1,414 @@
+import csv
+import glob
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+
+import configs.env as env
+import pyarrow as pa
+import pyarrow.parquet as pq
+from minio import Minio
+from pymilvus import BulkInsertState, Collection, DataType, connections, utility
+from schemas.collection_specs import SPECS, ColumnBuffer
+from schemas.embedding_artifacts import EmbeddingArtifacts, artifact_directory
+from services.chunker import TokenChunker
+from services.ingest_ledger import IngestLedger
+
+ARROW_TYPES = {
+    DataType.INT32: pa.int32(),
+    DataType.INT64: pa.int64(),
+    DataType.VARCHAR: pa.string(),
+    DataType.FLOAT_VECTOR: pa.list_(pa.float32()),
+}
+
+_splitter = None
+
+
+def connect_to_milvus():
+    connections.connect(host=env.MILVUS_HOST, port=env.MILVUS_PORT)
+    print('Connected to Milvus')
+
+def drop_collection_if_exists(collection_name):
+    if utility.has_collection(collection_name):
+        utility.drop_collection(collection_name)
+
+def create_collection(spec):
+    collection = Collection(name=spec.name, schema=spec.schema())
+
+    for embedding_field in spec.embeddings:
+        collection.create_index(field_name=embedding_field, index_params=spec.index_params(embedding_field))
+    collection.load()
+
+    print('Collection created and indices created')
+    return collection
+
+def init_splitter(chunk_overlap, model_name, tokens_per_chunk, max_bytes):
+    global _splitter
+    _splitter = TokenChunker.from_pretrained(model_name, tokens_per_chunk, chunk_overlap, max_bytes)
+
+def split_text(text):
+    return _splitter.split_text(text)
+
+def prepare_row(spec_name, row):
+    spec = SPECS[spec_name]
+    values = spec.parse_row(row)
+    if values is None:
+        return None
+
+    chunking = spec.chunking
+    if chunking is None:
+        return {name: [value] for name, value in values.items()}, {}
+
+    text = values.pop(chunking.field)
+    if chunking.preprocess:
+        text = chunking.preprocess(text)
+    chunks = split_text(text)
+    return {chunking.field: chunks, 'chunk_id': list(range(1, len(chunks) + 1))}, values
+
+def read_rows(file_path, start_row=0, encoding='utf-8'):
+    with open(file_path, 'r', encoding=encoding, newline='') as file:
+        reader = csv.reader(file, delimiter=',')
+        next(reader)
+        for row_number, row in enumerate(reader, start=1):
+            if row_number >= start_row:
+                yield row_number, row
+
+def windows(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        window = list(islice(iterator, size))
+        if not window:
+            return
+        yield window
+
+def _prepare(spec_name, item):
+    row_number, row = item
+    return row_number, prepare_row(spec_name, row)
+
+
+class Checkpoint:
+    def __init__(self, path):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        if not self.exists():
+            return {'row': 0, 'chunk': 0, 'inserted': 0, 'imports': {}}
+        with open(self.path, 'r', encoding='utf-8') as file:
+            state = json.load(file)
+        state.setdefault('imports', {})
+        return state
+
+    def save(self, row, chunk, inserted):
+        self._write({**self.load(), 'row': row, 'chunk': chunk, 'inserted': inserted})
+
+    def save_import(self, file_name, task_id, state):
+        checkpoint = self.load()
+        checkpoint['imports'][file_name] = {'task_id': task_id, 'state': state}
+        self._write(checkpoint)
+
+    def _write(self, checkpoint):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(checkpoint, file)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if self.exists():
+            os.remove(self.path)
+
+
+class InsertSink:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def reset(self):
+        pass
+
+    def write(self, data):
+        self.collection.insert(data)
+        return True
+
+    def finish(self):
+        return False
+
+    def close(self, checkpoint):
+        self.collection.flush()
+
+
+class LocalSink:
+    def __init__(self, spec, directory=env.LOCAL_STORE_LOADER_DIR):
+        from services.local_vector_store import LocalCollection
+        self.spec = spec
+        self.collection = LocalCollection(spec, directory)
+
+    def reset(self):
+        self.collection.clear()
+
+    def write(self, data):
+        self.collection.insert(dict(zip(self.spec.insert_fields, data)))
+        return False
+
+    def finish(self):
+        self.collection.flush()
+        return True
+
+    def close(self, checkpoint):
+        pass
+
+
+class BulkImportSink:
+    def __init__(self, spec, directory=env.BULK_IMPORT_DIR, file_rows=env.BULK_IMPORT_FILE_ROWS, storage=env.BULK_IMPORT_STORAGE):
+        self.spec = spec
+        self.directory = os.path.join(directory, spec.name)
+        self.file_rows = file_rows
+        self.storage = storage
+        self.schema = pa.schema([(field.name, ARROW_TYPES[field.dtype]) for field in spec.fields if not field.auto_id])
+        self._writer = None
+        self._rows = 0
+        os.makedirs(self.directory, exist_ok=True)
+        for part_path in glob.glob(os.path.join(self.directory, '*.part')):
+            os.remove(part_path)
+
+    def reset(self):
+        for path in self._files():
+            os.remove(path)
+
+    def write(self, data):
+        if self._writer is None:
+            self._path = os.path.join(self.directory, f'{len(self._files()):05d}.parquet')
+            self._writer = pq.ParquetWriter(self._path + '.part', self.schema)
+        self._writer.write_table(pa.Table.from_arrays(data, schema=self.schema))
+        self._rows += len(data[0])
+        if self._rows < self.file_rows:
+            return False
+        self._close_file()
+        return True
+
+    def finish(self):
+        if self._writer is None:
+            return False
+        self._close_file()
+        return True
+
+    def close(self, checkpoint):
+        files = self._files()
+        if self.storage != 'minio':
+            print(f'Wrote {len(files)} Parquet file(s) to {self.directory}, skipping import for {self.storage} storage')
+            return
+
+        # A resumed run waits on the tasks it already started and never imports a completed file twice
+        imports = checkpoint.load()['imports']
+        task_ids = {name: record['task_id'] for name, record in imports.items() if record['state'] == 'started'}
+        done = {name for name, record in imports.items() if record['state'] == 'completed'}
+        if done:
+            print(f'Skipping {len(done)} Parquet file(s) imported before the restart')
+        new_files = [path for path in files if os.path.basename(path) not in done | set(task_ids)]
+        for path, remote_file in zip(new_files, self._upload(new_files)):
+            task_id = utility.do_bulk_insert(collection_name=self.spec.name, files=[remote_file])
+            checkpoint.save_import(os.path.basename(path), task_id, 'started')
+            task_ids[os.path.basename(path)] = task_id
+        self._wait(task_ids, checkpoint)
+
+    def _files(self):
+        return sorted(glob.glob(os.path.join(self.directory, '*.parquet')))
+
+    def _close_file(self):
+        self._writer.close()
+        os.replace(self._path + '.part', self._path)
+        self._writer = None
+        self._rows = 0
+
+    def _upload(self, files):
+        if not files:
+            return []
+        client = Minio(env.BULK_IMPORT_MINIO_ENDPOINT, access_key=env.BULK_IMPORT_MINIO_ACCESS_KEY,
+                       secret_key=env.BULK_IMPORT_MINIO_SECRET_KEY, secure=False)
+        remote_files = []
+        for path in files:
+            remote_file = f'bulk_import/{self.spec.name}/{os.path.basename(path)}'
+            client.fput_object(env.BULK_IMPORT_MINIO_BUCKET, remote_file, path)
+            remote_files.append(remote_file)
+        print(f'Uploaded {len(remote_files)} Parquet file(s) to {env.BULK_IMPORT_MINIO_BUCKET}')
+        return remote_files
+
+    def _wait(self, task_ids, checkpoint):
+        pending = dict(task_ids)
+        while pending:
+            time.sleep(env.BULK_IMPORT_POLL_INTERVAL)
+            progress = []
+            for file_name, task_id in list(pending.items()):
+                state = utility.get_bulk_insert_state(task_id=task_id)
+                if state.state == BulkInsertState.ImportCompleted:
+                    checkpoint.save_import(file_name, task_id, 'completed')
+                    del pending[file_name]
+                elif state.state in (BulkInsertState.ImportFailed, BulkInsertState.ImportFailedAndCleaned):
+                    # Failed tasks leave nothing behind, the next run imports the file again
+                    checkpoint.save_import(file_name, task_id, 'failed')
+                    raise Exception(f'Bulk import task {task_id} failed: {state.failed_reason}')
+                progress.append(f'{task_id}: {state.state_name} {state.progress}% ({state.row_count} rows)')
+            print('Bulk import progress:', ', '.join(progress))
+
+
+class BulkLoader:
+    def __init__(self, spec, encode, batch_size=env.BATCH_SIZE, workers=env.LOADER_WORKERS, limit=env.COUNT,
+                 prefetch=env.LOADER_PREFETCH_WINDOWS):
+        self.spec = spec
+        self.encode = encode
+        self.batch_size = batch_size
+        self.workers = workers
+        self.prefetch = prefetch
+        self.limit = limit
+        self.checkpoint = Checkpoint(os.path.join(env.LOADER_CHECKPOINT_DIR, f'{spec.name}.json'))
+        self.timings = {'prepare': 0.0, 'encode': 0.0, 'insert': 0.0}
+        self.artifacts = EmbeddingArtifacts(artifact_directory(spec)) if env.USE_EMBEDDING_ARTIFACTS else None
+        self._position = (0, 0)
+
+    def run(self, file_path, sink):
+        state = self.checkpoint.load()
+        if state['row']:
+            print(f"Resuming {self.spec.name} from row {state['row']} (chunk {state['chunk']}), {state['inserted']} items already inserted")
+
+        chunking = self.spec.chunking
+        initargs = (chunking.chunk_overlap, chunking.model_name, chunking.tokens_per_chunk,
+                    self.spec.max_length(chunking.field)) if chunking else ()
+        buffer = ColumnBuffer(self.spec.insert_fields + ['_row', '_chunk'])
+        inserted = state['inserted']
+        rows = 0
+        started = time.perf_counter()
+        pending = None
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=init_splitter if chunking else None, initargs=initargs) as pool, \
+                 ThreadPoolExecutor(max_workers=1, thread_name_prefix='loader-insert') as io:
+                for row_number, prepared in self._prepared(pool, file_path, state['row']):
+                    available = self.limit - inserted - len(buffer)
+                    if available <= 0:
+                        break
+                    rows += 1
+                    if prepared is None:
+                        continue
+
+                    columns, constants = prepared
+                    size = len(next(iter(columns.values())))
+                    skip = state['chunk'] if row_number == state['row'] else 0
+                    take = min(size - skip, available)
+                    if take <= 0:
+                        continue
+                    columns = {name: column[skip:skip + take] for name, column in columns.items()}
+                    columns['_chunk'] = list(range(skip + 1, skip + take + 1))
+                    buffer.extend(columns, _row=row_number, **constants)
+
+                    while len(buffer) >= self.batch_size:
+                        inserted += self.batch_size
+                        pending = self._flush(sink, buffer.take(self.batch_size), pending, io, inserted)
+
+                if len(buffer):
+                    inserted += len(buffer)
+                    pending = self._flush(sink, buffer.take(), pending, io, inserted)
+                if pending:
+                    pending.result()
+
+            if sink.finish():
+                self.checkpoint.save(*self._position, inserted)
+            sink.close(self.checkpoint)
+            self.checkpoint.clear()
+        except Exception as e:
+            print('Error occurred during data insertion:', str(e))
+            raise e
+        finally:
+            if self.artifacts:
+                self.artifacts.save()
+
+        self._report(self.spec.name, rows, inserted - state['inserted'], inserted, time.perf_counter() - started)
+
+    def _prepared(self, pool, file_path, start_row):
+        # pool.map submits a window as soon as it is called, keeping the next windows queued means the workers
+        # prepare them while the caller is still encoding and inserting the current one
+        in_flight = deque()
+        for window in windows(read_rows(file_path, start_row), self.workers * 16):
+            in_flight.append(pool.map(partial(_prepare, self.spec.name), window, chunksize=8))
+            if len(in_flight) > self.prefetch:
+                yield from self._results(in_flight.popleft())
+        while in_flight:
+            yield from self._results(in_flight.popleft())
+
+    def _results(self, results):
+        while True:
+            wait_started = time.perf_counter()
+            item = next(results, None)
+            self.timings['prepare'] += time.perf_counter() - wait_started
+            if item is None:
+                return
+            yield item
+
+    def _flush(self, sink, batch, pending, io, inserted):
+        encode_started = time.perf_counter()
+        for embedding_field, text_field in self.spec.embeddings.items():
+            texts = batch[text_field]
+            unique_texts = list(dict.fromkeys(texts))
+            if self.artifacts:
+                encoded = dict(zip(unique_texts, self.artifacts.encode(unique_texts, self.encode)))
+            else:
+                encoded = dict(zip(unique_texts, self.encode(unique_texts).tolist()))
+            batch[embedding_field] = [encoded[text] for text in texts]
+        self.timings['encode'] += time.perf_counter() - encode_started
+
+        if pending:
+            pending.result()
+
+        data = [batch[field_name] for field_name in self.spec.insert_fields]
+        self._position = (batch['_row'][-1], batch['_chunk'][-1])
+        return io.submit(self._insert, sink, data, *self._position, inserted)
+
+    def _insert(self, sink, data, row_number, chunk, inserted):
+        insert_started = time.perf_counter()
+        committed = sink.write(data)
+        self.timings['insert'] += time.perf_counter() - insert_started
+        if committed:
+            self.checkpoint.save(row_number, chunk, inserted)
+
+    def _report(self, collection_name, rows, items, total, elapsed):
+        print('Inserted data successfully in:', collection_name)
+        print('Number of inserted items:', total)
+        print(f'Processed {rows} rows and {items} items in {elapsed:.1f}s '
+              f'({items / elapsed if elapsed else 0.0:.1f} items/s; '
+              f"waiting on prepare {self.timings['prepare']:.1f}s, encode {self.timings['encode']:.1f}s, insert {self.timings['insert']:.1f}s)")
+        if self.artifacts:
+            print(f'Embedding artifacts: {self.artifacts.hits} reused, {self.artifacts.misses} encoded')
+
+
+def reset_ingest_ledger(spec):
+    # The rebuilt collection no longer holds the versions ingested through the saga, redeliveries must write them again
+    if spec.name == env.DOCUMENT_COLLECTION_NAME:
+        IngestLedger(env.INGEST_LEDGER_LOADER_PATH).clear()
+
+def load_collection(spec, encode):
+    loader = BulkLoader(spec, encode)
+    resume = loader.checkpoint.exists()
+    if not resume:
+        reset_ingest_ledger(spec)
+    if env.LOADER_MODE == 'local':
+        sink = LocalSink(spec)
+        if not resume:
+            sink.reset()
+        loader.run(spec.file_path, sink)
+        return
+
+    connect_to_milvus()
+    if resume:
+        collection = Collection(name=spec.name)
+    else:
+        drop_collection_if_exists(spec.name)
+        collection = create_collection(spec)
+
+    sink = BulkImportSink(spec) if env.LOADER_MODE == 'bulk_import' else InsertSink(collection)
+    if not resume:
+        sink.reset()
+    loader.run(spec.file_path, sink)
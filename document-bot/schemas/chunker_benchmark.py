@@ -0,0 +1,72 @@
+import argparse
+import csv
+import resource
+import time
+
+import configs.env as env
+from schemas.collection_specs import DOCUMENTS, LECTURES
+from services.chunker import TokenChunker
+
+LEGACY_MODEL_NAME = 'sentence-transformers/all-mpnet-base-v2'
+
+
+def read_texts(spec, encoding='utf-8'):
+    chunking = spec.chunking
+    with open(spec.file_path, 'r', encoding=encoding, newline='') as file:
+        reader = csv.reader(file, delimiter=',')
+        next(reader)
+        for row in reader:
+            values = spec.parse_row(row)
+            if values is None:
+                continue
+            text = values[chunking.field]
+            yield chunking.preprocess(text) if chunking.preprocess else text
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def load_legacy_splitter(tokens_per_chunk, chunk_overlap):
+    from langchain_text_splitters import SentenceTransformersTokenTextSplitter
+    return SentenceTransformersTokenTextSplitter(chunk_overlap=chunk_overlap, model_name=LEGACY_MODEL_NAME,
+                                                 tokens_per_chunk=tokens_per_chunk)
+
+def benchmark(name, load, split, texts, repeat):
+    rss_before = max_rss_mb()
+    started = time.perf_counter()
+    splitter = load()
+    load_seconds = time.perf_counter() - started
+    rss_growth = max_rss_mb() - rss_before
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        chunks = [split(splitter, text) for text in texts]
+    split_seconds = (time.perf_counter() - started) / repeat
+
+    count = sum(len(text_chunks) for text_chunks in chunks)
+    print(f'{name:<34}{load_seconds:>9.2f}{rss_growth:>10.0f}{split_seconds:>10.2f}'
+          f'{len(texts) / split_seconds:>10.1f}{count:>9}')
+    return chunks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare the token chunker with the langchain sentence-transformers splitter')
+    parser.add_argument('--tokens-per-chunk', type=int, default=128)
+    parser.add_argument('--chunk-overlap', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=3, help='split every text this many times and average')
+    args = parser.parse_args()
+
+    texts = list(read_texts(DOCUMENTS)) + list(read_texts(LECTURES))
+    print(f'{len(texts)} texts, {sum(len(text) for text in texts)} characters, '
+          f'{args.tokens_per_chunk} tokens per chunk, overlap {args.chunk_overlap}')
+    print(f'{"splitter":<34}{"load s":>9}{"rss MB":>10}{"split s":>10}{"texts/s":>10}{"chunks":>9}')
+
+    # the rust tokenizer runs first, max RSS only grows so the larger model would hide its footprint
+    benchmark(f'TokenChunker ({env.EMBEDDING_MODEL_NAME})',
+              lambda: TokenChunker.from_pretrained(env.EMBEDDING_MODEL_NAME, args.tokens_per_chunk, args.chunk_overlap),
+              lambda splitter, text: splitter.split_text(text), texts, args.repeat)
+    try:
+        benchmark('langchain (all-mpnet-base-v2)',
+                  lambda: load_legacy_splitter(args.tokens_per_chunk, args.chunk_overlap),
+                  lambda splitter, text: splitter.split_text(text=text), texts, args.repeat)
+    except ImportError:
+        print('langchain_text_splitters is not installed, pip install langchain_text_splitters==0.2.1 to compare')
@@ -0,0 +1,146 @@
+import configs.env as env
+import strip_markdown
+from pymilvus import AnnSearchRequest, CollectionSchema, DataType, FieldSchema
+
+DEFAULT_INDEX_PARAMS = {'index_type': 'IVF_FLAT', 'params': {'nlist': 128}}
+DEFAULT_SEARCH_PARAMS = {
+    'FLAT': {},
+    'IVF_FLAT': {'nprobe': 16},
+    'IVF_SQ8': {'nprobe': 16},
+    'HNSW': {'ef': 64},
+}
+
+
+class ChunkingPolicy:
+    def __init__(self, field, chunk_overlap, tokens_per_chunk=128, model_name=env.EMBEDDING_MODEL_NAME, preprocess=None):
+        self.field = field
+        self.chunk_overlap = chunk_overlap
+        self.tokens_per_chunk = tokens_per_chunk
+        self.model_name = model_name
+        self.preprocess = preprocess
+
+
+class CollectionSpec:
+    def __init__(self, name, fields, csv_columns, embeddings, file_path, chunking=None):
+        self.name = name
+        self.fields = fields
+        self.csv_columns = csv_columns
+        self.embeddings = embeddings
+        self.file_path = file_path
+        self.chunking = chunking
+        self.insert_fields = [field.name for field in fields if not field.auto_id]
+        self.output_fields = [field.name for field in fields
+                              if not field.is_primary and field.dtype != DataType.FLOAT_VECTOR]
+
+    def schema(self):
+        return CollectionSchema(fields=self.fields)
+
+    def parse_row(self, row):
+        if len(row) < len(self.csv_columns) or '' in row[:len(self.csv_columns)]:
+            return None
+        return {name: convert(value) for (name, convert), value in zip(self.csv_columns, row)}
+
+    def max_length(self, field_name):
+        return next(field.params['max_length'] for field in self.fields if field.name == field_name)
+
+    def index_params(self, anns_field):
+        index = env.INDEX_PARAMS.get(self.name, {}).get(anns_field, DEFAULT_INDEX_PARAMS)
+        return {'metric_type': env.METRIC_TYPE, **index}
+
+    def search_params(self, anns_field):
+        # Only the knobs of the field's index type are sent, nprobe for IVF and ef for HNSW
+        defaults = DEFAULT_SEARCH_PARAMS[self.index_params(anns_field)['index_type']]
+        tuned = env.SEARCH_PARAMS.get(self.name, {}).get(anns_field, {})
+        params = {name: tuned.get(name, value) for name, value in defaults.items()}
+        return {'metric_type': env.METRIC_TYPE, 'params': params}
+
+    def ann_request(self, data, anns_field, limit):
+        return AnnSearchRequest(data=data, anns_field=anns_field, param=self.search_params(anns_field), limit=limit)
+
+
+class ColumnBuffer:
+    def __init__(self, field_names):
+        self.field_names = field_names
+        self._columns = {field_name: [] for field_name in field_names}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def extend(self, columns, **constants):
+        size = len(next(iter(columns.values())))
+        for field_name in self.field_names:
+            if field_name in columns:
+                self._columns[field_name].extend(columns[field_name])
+            elif field_name in constants:
+                self._columns[field_name].extend([constants[field_name]] * size)
+        self._size += size
+
+    def take(self, size=None):
+        size = self._size if size is None else min(size, self._size)
+        taken = {}
+        for field_name, column in self._columns.items():
+            taken[field_name] = column[:size]
+            del column[:size]
+        self._size -= size
+        return taken
+
+
+DOCUMENTS = CollectionSpec(
+    name=env.DOCUMENT_COLLECTION_NAME,
+    fields=[
+        FieldSchema(name='id', dtype=DataType.INT64, is_primary=True, auto_id=True),
+        FieldSchema(name='project_id', dtype=DataType.INT64),
+        FieldSchema(name='document_id', dtype=DataType.INT64),
+        FieldSchema(name='name', dtype=DataType.VARCHAR, max_length=50),
+        FieldSchema(name='version', dtype=DataType.INT32),
+        FieldSchema(name='chunk_id', dtype=DataType.INT32),
+        FieldSchema(name='text', dtype=DataType.VARCHAR, max_length=1000),
+        FieldSchema(name='txt_emb', dtype=DataType.FLOAT_VECTOR, dim=env.DIMENSION),
+    ],
+    csv_columns=[('project_id', int), ('document_id', int), ('name', str), ('version', int), ('text', str)],
+    embeddings={'txt_emb': 'text'},
+    file_path=env.DOCUMENT_FILE_PATH,
+    chunking=ChunkingPolicy(field='text', chunk_overlap=5),
+)
+
+LECTURES = CollectionSpec(
+    name=env.LECTURES_COLLECTION_NAME,
+    fields=[
+        FieldSchema(name='id', dtype=DataType.INT64, is_primary=True, auto_id=True),
+        FieldSchema(name='name', dtype=DataType.VARCHAR, max_length=255),
+        FieldSchema(name='content', dtype=DataType.VARCHAR, max_length=20000),
+        FieldSchema(name='difficulty', dtype=DataType.INT32),
+        FieldSchema(name='min_recommended_age', dtype=DataType.INT32),
+        FieldSchema(name='max_recommended_age', dtype=DataType.INT32),
+        FieldSchema(name='creator_id', dtype=DataType.INT64),
+        FieldSchema(name='chunk_id', dtype=DataType.INT32),
+        FieldSchema(name='name_emb', dtype=DataType.FLOAT_VECTOR, dim=env.DIMENSION),
+        FieldSchema(name='content_emb', dtype=DataType.FLOAT_VECTOR, dim=env.DIMENSION),
+    ],
+    csv_columns=[('name', str), ('content', str), ('difficulty', int), ('min_recommended_age', int),
+                 ('max_recommended_age', int), ('creator_id', int)],
+    embeddings={'name_emb': 'name', 'content_emb': 'content'},
+    file_path=env.LECTURES_FILE_PATH,
+    chunking=ChunkingPolicy(field='content', chunk_overlap=10, preprocess=strip_markdown.strip_markdown),
+)
+
+PROJECTS = CollectionSpec(
+    name=env.PROJECT_COLLECTION_NAME,
+    fields=[
+        FieldSchema(name='id', dtype=DataType.INT64, is_primary=True, auto_id=False),
+        FieldSchema(name='name', dtype=DataType.VARCHAR, max_length=50),
+        FieldSchema(name='description', dtype=DataType.VARCHAR, max_length=500),
+        FieldSchema(name='budget', dtype=DataType.INT32),
+        FieldSchema(name='type', dtype=DataType.VARCHAR, max_length=8),
+        FieldSchema(name='name_emb', dtype=DataType.FLOAT_VECTOR, dim=env.DIMENSION),
+        FieldSchema(name='descr_emb', dtype=DataType.FLOAT_VECTOR, dim=env.DIMENSION),
+    ],
+    csv_columns=[('id', int), ('name', str), ('description', str), ('budget', int), ('type', str)],
+    embeddings={'name_emb': 'name', 'descr_emb': 'description'},
+    file_path=env.PROJECT_FILE_PATH,
+)
+
+SPECS = {spec.name: spec for spec in (DOCUMENTS, LECTURES, PROJECTS)}
+# the API shares one splitter across collections, so its chunks must fit the smallest chunked column
+CHUNK_MAX_LENGTH = min(spec.max_length(spec.chunking.field) for spec in SPECS.values() if spec.chunking)
@@ -0,0 +1,105 @@
+import glob
+import hashlib
+import json
+import os
+
+import configs.env as env
+import numpy as np
+
+
+def text_key(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def artifact_directory(spec, model_name=env.EMBEDDING_MODEL_NAME):
+    if env.EMBEDDING_BACKEND == 'onnx' and env.ONNX_QUANTIZED:
+        model_name = f'{model_name}-int8'
+    chunking = spec.chunking
+    chunker_config = {
+        'field': chunking.field,
+        'chunk_overlap': chunking.chunk_overlap,
+        'tokens_per_chunk': chunking.tokens_per_chunk,
+        'model_name': chunking.model_name,
+        'preprocess': getattr(chunking.preprocess, '__name__', None),
+    } if chunking else None
+    config_key = hashlib.sha1(json.dumps([model_name, chunker_config], sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(env.EMBEDDING_ARTIFACT_DIR, spec.name, config_key)
+
+
+class EmbeddingArtifacts:
+    def __init__(self, directory, segment_rows=env.EMBEDDING_ARTIFACT_SEGMENT_ROWS, max_segments=env.EMBEDDING_ARTIFACT_MAX_SEGMENTS):
+        self.directory = directory
+        self.segment_rows = segment_rows
+        self.max_segments = max_segments
+        self.hits = 0
+        self.misses = 0
+        self._segments = []
+        self._index = {}
+        self._pending = {}
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        self._segments = []
+        self._index = {}
+        for keys_path in sorted(glob.glob(os.path.join(self.directory, 'segment-*.keys.json'))):
+            with open(keys_path, 'r', encoding='utf-8') as file:
+                keys = json.load(file)
+            vectors = np.load(keys_path[:-len('.keys.json')] + '.npy', mmap_mode='r')
+            segment = len(self._segments)
+            self._segments.append(vectors)
+            for row, key in enumerate(keys):
+                self._index[key] = (segment, row)
+
+    def encode(self, texts, encode):
+        keys = [text_key(text) for text in texts]
+        embeddings = [None] * len(texts)
+        missing = []
+        for position, key in enumerate(keys):
+            if key in self._pending:
+                embeddings[position] = self._pending[key]
+            elif key in self._index:
+                segment, row = self._index[key]
+                embeddings[position] = self._segments[segment][row].tolist()
+            else:
+                missing.append(position)
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            encoded = encode([texts[position] for position in missing]).tolist()
+            for position, embedding in zip(missing, encoded):
+                embeddings[position] = embedding
+                self._pending[keys[position]] = embedding
+            if len(self._pending) >= self.segment_rows:
+                self.save()
+        return embeddings
+
+    def save(self):
+        if not self._pending:
+            return
+        self._write_segment(list(self._pending.keys()), np.asarray(list(self._pending.values()), dtype=np.float32))
+        self._pending = {}
+        if len(self._segments) + 1 > self.max_segments:
+            self._compact()
+        self._load()
+
+    def _write_segment(self, keys, vectors, name=None):
+        name = name or f'segment-{len(glob.glob(os.path.join(self.directory, "segment-*.keys.json"))):06d}'
+        path = os.path.join(self.directory, name)
+        np.save(path + '.tmp.npy', vectors)
+        os.replace(path + '.tmp.npy', path + '.npy')
+        with open(path + '.keys.tmp', 'w', encoding='utf-8') as file:
+            json.dump(keys, file)
+        os.replace(path + '.keys.tmp', path + '.keys.json')
+
+    def _compact(self):
+        self._load()
+        keys = list(self._index.keys())
+        vectors = np.stack([self._segments[segment][row] for segment, row in self._index.values()]).astype(np.float32)
+        old_paths = glob.glob(os.path.join(self.directory, 'segment-*'))
+        self._segments = []
+        self._write_segment(keys, vectors, name='compacted.tmp')
+        for path in old_paths:
+            os.remove(path)
+        os.replace(os.path.join(self.directory, 'compacted.tmp.npy'), os.path.join(self.directory, 'segment-000000.npy'))
+        os.replace(os.path.join(self.directory, 'compacted.tmp.keys.json'), os.path.join(self.directory, 'segment-000000.keys.json'))
@@ -0,0 +1,65 @@
+import argparse
+import json
+import os
+import time
+
+import configs.env as env
+from services.onnx_embedder import CONFIG_FILE, MODEL_FILE, QUANTIZED_MODEL_FILE, model_directory
+
+INPUT_NAMES = ['input_ids', 'attention_mask', 'token_type_ids']
+
+
+def export(model_name, directory, quantize, opset):
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    transformer = SentenceTransformer(model_name, device='cpu')
+    pooling = next(module for module in transformer if isinstance(module, Pooling))
+    if pooling.get_pooling_mode_str() != 'mean':
+        raise ValueError(f'{model_name} uses {pooling.get_pooling_mode_str()} pooling, the ONNX backend only implements mean pooling')
+
+    os.makedirs(directory, exist_ok=True)
+    model = transformer[0].auto_model.eval()
+    tokenizer = transformer[0].tokenizer
+    sample = tokenizer(['Export the embedding model to ONNX'], return_tensors='pt')
+    model_path = os.path.join(directory, MODEL_FILE)
+
+    started = time.perf_counter()
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in INPUT_NAMES),
+            model_path,
+            input_names=INPUT_NAMES,
+            output_names=['last_hidden_state'],
+            dynamic_axes={name: {0: 'batch', 1: 'sequence'} for name in INPUT_NAMES + ['last_hidden_state']},
+            opset_version=opset,
+        )
+    print(f'Exported {model_name} to {model_path} in {time.perf_counter() - started:.1f}s')
+
+    tokenizer.save_pretrained(directory)
+    config = {
+        'model_name': model_name,
+        'max_seq_length': transformer.max_seq_length,
+        'normalize': any(isinstance(module, Normalize) for module in transformer),
+    }
+    with open(os.path.join(directory, CONFIG_FILE), 'w', encoding='utf-8') as file:
+        json.dump(config, file)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantized_path = os.path.join(directory, QUANTIZED_MODEL_FILE)
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        print(f'Quantized to {quantized_path} ({os.path.getsize(model_path) / 2 ** 20:.0f} MB -> '
+              f'{os.path.getsize(quantized_path) / 2 ** 20:.0f} MB)')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export the embedding model for the ONNX Runtime backend')
+    parser.add_argument('--output', default=env.ONNX_MODEL_DIR, help='relative paths resolve against document-bot/')
+    parser.add_argument('--no-quantize', action='store_true', help='skip the int8 model')
+    parser.add_argument('--opset', type=int, default=14)
+    args = parser.parse_args()
+
+    export(env.EMBEDDING_MODEL_NAME, model_directory(args.output), not args.no_quantize, args.opset)
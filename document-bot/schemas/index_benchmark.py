@@ -0,0 +1,133 @@
+import argparse
+import time
+
+import configs.env as env
+import numpy as np
+from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, utility
+from schemas.bulk_loader import connect_to_milvus, drop_collection_if_exists
+from schemas.collection_specs import SPECS
+
+BENCHMARK_COLLECTION_NAME = 'index_benchmark'
+NLISTS = (16, 64, 128, 256, 1024, 1536)
+NPROBES = (1, 4, 8, 16, 32, 64)
+HNSW_MS = (8, 16, 32)
+HNSW_EFS = (16, 32, 64, 128, 256)
+
+
+def fetch_vectors(spec, anns_field):
+    primary = next(field.name for field in spec.fields if field.is_primary)
+    collection = Collection(spec.name)
+    collection.load()
+    iterator = collection.query_iterator(batch_size=1000, expr=f'{primary} >= 0', output_fields=[anns_field])
+
+    vectors = []
+    while True:
+        result = iterator.next()
+        if len(result) == 0:
+            iterator.close()
+            break
+        vectors.extend(row[anns_field] for row in result)
+    return np.asarray(vectors, dtype=np.float32)
+
+def split_queries(vectors, num_queries, seed=0):
+    order = np.random.default_rng(seed).permutation(len(vectors))
+    return vectors[order[num_queries:]], vectors[order[:num_queries]]
+
+def ground_truth(base, queries, k):
+    distances = (queries ** 2).sum(axis=1)[:, None] - 2 * queries @ base.T + (base ** 2).sum(axis=1)[None, :]
+    nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(distances, nearest, axis=1).argsort(axis=1)
+    return np.take_along_axis(nearest, order, axis=1)
+
+def sweep(rows, k):
+    yield {'index_type': 'FLAT', 'params': {}}, [{}]
+    for index_type in ('IVF_FLAT', 'IVF_SQ8'):
+        for nlist in NLISTS:
+            if nlist > rows:
+                continue
+            yield ({'index_type': index_type, 'params': {'nlist': nlist}},
+                   [{'nprobe': nprobe} for nprobe in NPROBES if nprobe <= nlist])
+    for m in HNSW_MS:
+        yield ({'index_type': 'HNSW', 'params': {'M': m, 'efConstruction': 200}},
+               [{'ef': ef} for ef in HNSW_EFS if ef >= k])
+
+def create_benchmark_collection(base):
+    drop_collection_if_exists(BENCHMARK_COLLECTION_NAME)
+    schema = CollectionSchema(fields=[
+        FieldSchema(name='id', dtype=DataType.INT64, is_primary=True, auto_id=False),
+        FieldSchema(name='vector', dtype=DataType.FLOAT_VECTOR, dim=base.shape[1]),
+    ])
+    collection = Collection(name=BENCHMARK_COLLECTION_NAME, schema=schema)
+    for start in range(0, len(base), env.COUNT):
+        stop = min(start + env.COUNT, len(base))
+        collection.insert([list(range(start, stop)), base[start:stop].tolist()])
+    collection.flush()
+    return collection
+
+def run_queries(collection, queries, params, k):
+    found, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = collection.search(data=[query.tolist()], anns_field='vector', param=params, limit=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append([hit.id for hit in result[0]])
+    return found, np.asarray(latencies)
+
+def recall(found, truth, k):
+    return float(np.mean([len(set(ids) & set(expected)) / k for ids, expected in zip(found, truth.tolist())]))
+
+def benchmark(spec, anns_field, num_queries, k):
+    vectors = fetch_vectors(spec, anns_field)
+    if len(vectors) <= num_queries:
+        print(f'Skipping {spec.name}.{anns_field}: only {len(vectors)} vectors')
+        return
+
+    base, queries = split_queries(vectors, num_queries)
+    truth = ground_truth(base, queries, k)
+    collection = create_benchmark_collection(base)
+    configured = spec.index_params(anns_field)
+    configured_search = spec.search_params(anns_field)['params']
+
+    print(f'\n{spec.name}.{anns_field}: {len(base)} vectors, {len(queries)} queries, recall@{k}')
+    print(f'{"index":<10}{"build":>16}{"search":>14}{"build s":>10}{"recall":>9}{"p50 ms":>9}{"p99 ms":>9}')
+    try:
+        for index, search_grid in sweep(len(base), k):
+            index_params = {'metric_type': env.METRIC_TYPE, **index}
+            start = time.perf_counter()
+            collection.create_index(field_name='vector', index_params=index_params)
+            utility.wait_for_index_building_complete(BENCHMARK_COLLECTION_NAME)
+            collection.load()
+            build_seconds = time.perf_counter() - start
+
+            for search in search_grid:
+                found, latencies = run_queries(collection, queries, {'metric_type': env.METRIC_TYPE, 'params': search}, k)
+                marker = ' *' if (index['index_type'] == configured['index_type'] and index['params'] == configured['params']
+                                  and search == configured_search) else ''
+                print(f'{index["index_type"]:<10}{format_params(index["params"]):>16}{format_params(search):>14}'
+                      f'{build_seconds:>10.2f}{recall(found, truth, k):>9.3f}'
+                      f'{np.percentile(latencies, 50):>9.2f}{np.percentile(latencies, 99):>9.2f}{marker}')
+
+            collection.release()
+            collection.drop_index()
+    finally:
+        drop_collection_if_exists(BENCHMARK_COLLECTION_NAME)
+
+def format_params(params):
+    return ','.join(f'{name}={value}' for name, value in params.items()) or '-'
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Sweep index and search params against a brute-force ground truth')
+    parser.add_argument('--collection', choices=sorted(SPECS), help='benchmark one collection, default all')
+    parser.add_argument('--field', help='benchmark one vector field of the collection, default all')
+    parser.add_argument('--queries', type=int, default=200, help='vectors held out of the index as queries')
+    parser.add_argument('--k', type=int, default=10, help='neighbours compared against the ground truth')
+    args = parser.parse_args()
+
+    connect_to_milvus()
+    specs = [SPECS[args.collection]] if args.collection else list(SPECS.values())
+    for spec in specs:
+        for anns_field in spec.embeddings:
+            if args.field in (None, anns_field):
+                benchmark(spec, anns_field, args.queries, args.k)
+    print('\n* marks the settings configured in configs/env.py')
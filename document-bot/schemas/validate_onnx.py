@@ -0,0 +1,78 @@
+import argparse
+import csv
+import sys
+import time
+
+import configs.env as env
+import numpy as np
+from schemas.collection_specs import SPECS
+from services.embedding_service import chunk
+from services.onnx_embedder import OnnxEmbedder
+
+
+def read_texts(spec, limit, encoding='utf-8'):
+    texts = []
+    with open(spec.file_path, 'r', encoding=encoding, newline='') as file:
+        reader = csv.reader(file, delimiter=',')
+        next(reader)
+        for row in reader:
+            values = spec.parse_row(row)
+            if values is None:
+                continue
+            for text_field in spec.embeddings.values():
+                text = values[text_field]
+                if spec.chunking and text_field == spec.chunking.field:
+                    if spec.chunking.preprocess:
+                        text = spec.chunking.preprocess(text)
+                    texts.extend(chunk_txt for _, chunk_txt, _ in chunk(text))
+                else:
+                    texts.append(text)
+            if len(texts) >= limit:
+                break
+    return texts[:limit]
+
+def timed_encode(model, texts, batch_size):
+    started = time.perf_counter()
+    embeddings = np.asarray(model.encode(texts, batch_size=batch_size), dtype=np.float32)
+    return embeddings, time.perf_counter() - started
+
+def cosine(left, right):
+    left = left / np.linalg.norm(left, axis=1, keepdims=True)
+    right = right / np.linalg.norm(right, axis=1, keepdims=True)
+    return (left * right).sum(axis=1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare ONNX Runtime embeddings with the PyTorch model on the bundled CSVs')
+    parser.add_argument('--limit', type=int, default=2000, help='texts taken from each collection')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--min-cosine', type=float, default=0.999, help='lowest accepted similarity for the fp32 model')
+    parser.add_argument('--min-cosine-int8', type=float, default=0.98, help='lowest accepted similarity for the int8 model')
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+    texts = [text for spec in SPECS.values() for text in read_texts(spec, args.limit)]
+    print(f'{len(texts)} texts from {", ".join(SPECS)}')
+
+    reference, reference_seconds = timed_encode(SentenceTransformer(env.EMBEDDING_MODEL_NAME, device='cpu'), texts, args.batch_size)
+    print(f'{"backend":<14}{"texts/s":>10}{"speedup":>9}{"min cos":>10}{"p01 cos":>10}{"mean cos":>10}')
+    print(f'{"torch fp32":<14}{len(texts) / reference_seconds:>10.1f}{1.0:>9.2f}')
+
+    failed, compared = False, 0
+    for name, quantized, threshold in (('onnx fp32', False, args.min_cosine), ('onnx int8', True, args.min_cosine_int8)):
+        try:
+            model = OnnxEmbedder.from_directory(env.ONNX_MODEL_DIR, quantized, env.ONNX_INTRA_OP_THREADS)
+        except FileNotFoundError as e:
+            print(f'{name:<14}skipped, {e.filename} is missing, run export_onnx.py first')
+            continue
+        embeddings, seconds = timed_encode(model, texts, args.batch_size)
+        compared += 1
+        similarity = cosine(reference, embeddings)
+        passed = similarity.min() >= threshold
+        failed = failed or not passed
+        print(f'{name:<14}{len(texts) / seconds:>10.1f}{reference_seconds / seconds:>9.2f}{similarity.min():>10.4f}'
+              f'{np.percentile(similarity, 1):>10.4f}{similarity.mean():>10.4f}  {"ok" if passed else f"below {threshold}"}')
+
+    if not compared:
+        print(f'No exported model in {env.ONNX_MODEL_DIR} to compare against')
+    sys.exit(1 if failed or not compared else 0)
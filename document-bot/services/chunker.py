@@ -0,0 +1,57 @@
+import numpy as np
+
+
+def tokenizer_name(model_name):
+    return model_name if '/' in model_name else f'sentence-transformers/{model_name}'
+
+
+def normalize_whitespace(text):
+    return ' '.join(text.split())
+
+
+class TokenChunker:
+    def __init__(self, tokenizer, tokens_per_chunk, chunk_overlap, max_bytes=None):
+        if chunk_overlap >= tokens_per_chunk:
+            raise ValueError(f'chunk_overlap ({chunk_overlap}) must be smaller than tokens_per_chunk ({tokens_per_chunk})')
+        tokenizer.no_truncation()
+        tokenizer.no_padding()
+        self.tokenizer = tokenizer
+        self.tokens_per_chunk = tokens_per_chunk
+        self.chunk_overlap = chunk_overlap
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_pretrained(cls, model_name, tokens_per_chunk, chunk_overlap, max_bytes=None):
+        from tokenizers import Tokenizer
+        return cls(Tokenizer.from_pretrained(tokenizer_name(model_name)), tokens_per_chunk, chunk_overlap, max_bytes)
+
+    def split_text(self, text):
+        return self.split_texts([text])[0]
+
+    def split_texts(self, texts):
+        encodings = self.tokenizer.encode_batch(texts, add_special_tokens=False)
+        return [self._windows(text, encoding.offsets) for text, encoding in zip(texts, encodings)]
+
+    def _windows(self, text, offsets):
+        count = len(offsets)
+        if count == 0:
+            return []
+        offsets = np.asarray(offsets, dtype=np.int64)
+        step = self.tokens_per_chunk - self.chunk_overlap
+        windows = 1 if count <= self.tokens_per_chunk else 1 + -(-(count - self.tokens_per_chunk) // step)
+        starts = np.arange(windows) * step
+        ends = np.minimum(starts + self.tokens_per_chunk, count)
+        chunks = []
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            chunks.extend(self._fit(text, offsets, start, end))
+        return chunks
+
+    def _fit(self, text, offsets, start, end):
+        # Dense windows can decode to more than the VARCHAR column holds, halve them until they fit
+        chunk = normalize_whitespace(text[offsets[start, 0]:offsets[end - 1, 1]])
+        if self.max_bytes is None or len(chunk.encode('utf-8')) <= self.max_bytes:
+            return [chunk] if chunk else []
+        if end - start == 1:
+            return [chunk.encode('utf-8')[:self.max_bytes].decode('utf-8', errors='ignore')]
+        middle = (start + end) // 2
+        return self._fit(text, offsets, start, middle) + self._fit(text, offsets, middle, end)
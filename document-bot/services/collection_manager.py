@@ -0,0 +1,113 @@
+import logging
+import threading
+
+import configs.env as env
+from pymilvus import Collection, utility
+from pymilvus.client.types import LoadState
+
+logger = logging.getLogger(__name__)
+
+NOT_LOADED = 'not_loaded'
+LOADING = 'loading'
+LOADED = 'loaded'
+FAILED = 'failed'
+
+
+_collections = {}
+
+
+class CollectionNotReady(Exception):
+    pass
+
+
+class CollectionManager:
+    def __init__(self, collection_names, refresh_interval):
+        self.refresh_interval = refresh_interval
+        self._states = {name: NOT_LOADED for name in collection_names}
+        self._errors = {}
+        self._indexes = {}
+        self._locks = {name: threading.Lock() for name in collection_names}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='collection-manager', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.refresh_interval)
+            self._thread = None
+
+    def get(self, collection_name):
+        if self._states[collection_name] != LOADED:
+            self.load(collection_name)
+        return get_collection(collection_name)
+
+    def load(self, collection_name, reload=False):
+        with self._locks[collection_name]:
+            if self._states[collection_name] == LOADED and not reload:
+                return
+            self._states[collection_name] = LOADING
+            try:
+                collection = get_collection(collection_name)
+                if reload:
+                    collection.release()
+                collection.load()
+                self._indexes[collection_name] = index_fingerprint(collection)
+            except Exception as e:
+                self._states[collection_name] = FAILED
+                self._errors[collection_name] = str(e)
+                raise CollectionNotReady(f'Collection {collection_name} could not be loaded: {e}') from e
+            self._states[collection_name] = LOADED
+            self._errors.pop(collection_name, None)
+            logger.info(f'Loaded collection {collection_name}')
+
+    def refresh(self):
+        for collection_name, state in list(self._states.items()):
+            try:
+                if state != LOADED:
+                    self.load(collection_name)
+                    continue
+                collection = get_collection(collection_name)
+                if utility.load_state(collection_name) != LoadState.Loaded:
+                    logger.info(f'Collection {collection_name} was released, loading it again')
+                    self.load(collection_name, reload=True)
+                elif index_fingerprint(collection) != self._indexes.get(collection_name):
+                    logger.info(f'Index of collection {collection_name} changed, reloading it')
+                    self.load(collection_name, reload=True)
+            except CollectionNotReady:
+                logger.exception(f'Collection {collection_name} is not ready')
+            except Exception as e:
+                self._states[collection_name] = FAILED
+                self._errors[collection_name] = str(e)
+                logger.exception(f'Could not check collection {collection_name}')
+
+    def ready(self):
+        return all(state == LOADED for state in self._states.values())
+
+    def status(self):
+        return {name: {'state': state, 'error': self._errors.get(name)} for name, state in self._states.items()}
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.refresh_interval)
+
+
+def get_collection(collection_name: str):
+    if collection_name not in _collections:
+        _collections[collection_name] = Collection(name=collection_name)
+    return _collections[collection_name]
+
+def index_fingerprint(collection):
+    return sorted((index.field_name, index.index_name, repr(index.params)) for index in collection.indexes)
+
+
+collection_manager = CollectionManager(
+    [env.PROJECT_COLLECTION_NAME, env.DOCUMENT_COLLECTION_NAME, env.LECTURES_COLLECTION_NAME],
+    env.COLLECTION_REFRESH_INTERVAL
+)
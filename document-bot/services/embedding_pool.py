@@ -0,0 +1,327 @@
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LANES = ('search', 'ingest')
+
+
+class PoolClosed(Exception):
+    pass
+
+
+class EncodeTimeout(Exception):
+    pass
+
+
+class EmbeddingTask:
+    def __init__(self, texts, lane, timeout=None):
+        self.texts = texts
+        self.lane = lane
+        self.timeout = timeout
+        self.future = Future()
+
+
+class WorkerSlot:
+    def __init__(self, index, context, load_model, input_bytes, max_rows, dimension, threads):
+        self.index = index
+        self.context = context
+        self.load_model = load_model
+        self.input_bytes = input_bytes
+        self.max_rows = max_rows
+        self.dimension = dimension
+        self.threads = threads
+        self.memory = shared_memory.SharedMemory(create=True, size=input_bytes + max_rows * dimension * 4)
+        self.input = np.ndarray((input_bytes,), dtype=np.uint8, buffer=self.memory.buf)
+        self.output = np.ndarray((max_rows, dimension), dtype=np.float32, buffer=self.memory.buf, offset=input_bytes)
+        self.process = None
+        self.connection = None
+        self.task = None
+        self.deadline = None
+        self.ready = False
+        self.error = None
+
+    def start(self):
+        # Each worker gets its own pipe rather than sharing a results queue, a worker that dies while writing
+        # would otherwise keep the queue's lock and block every other worker
+        worker_connection, self.connection = self.context.Pipe()
+        self.process = self.context.Process(
+            target=worker_main,
+            args=(self.load_model, self.memory.name, self.input_bytes, self.max_rows, self.dimension, self.threads,
+                  worker_connection),
+            name=f'embedding-worker-{self.index}',
+            daemon=True
+        )
+        self.ready = False
+        self.process.start()
+        worker_connection.close()
+
+    def assign(self, task):
+        data = b''.join(task.texts)
+        self.input[:len(data)] = np.frombuffer(data, dtype=np.uint8)
+        try:
+            self.connection.send([len(text) for text in task.texts])
+        except (BrokenPipeError, OSError):
+            # The worker died, the health check fails the task when it restarts the slot
+            pass
+        self.task = task
+        self.deadline = time.monotonic() + task.timeout if task.timeout else None
+
+    def restart(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.connection.close()
+        self.task = None
+        self.start()
+
+    def stop(self, timeout):
+        try:
+            self.connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.connection.close()
+
+    def release(self):
+        del self.input, self.output
+        self.memory.close()
+        self.memory.unlink()
+
+
+class EmbeddingWorkerPool:
+    def __init__(self, load_model, workers, max_ingest_workers, max_rows, input_bytes, dimension, threads, start_timeout,
+                 task_timeout=None, check_interval=1.0):
+        self.max_ingest_workers = max_ingest_workers
+        self.max_rows = max_rows
+        self.input_bytes = input_bytes
+        self.dimension = dimension
+        self.task_timeout = task_timeout
+        self.check_interval = check_interval
+        self.completed = {lane: {'tasks': 0, 'texts': 0} for lane in LANES}
+        self._pending = {lane: deque() for lane in LANES}
+        self._condition = threading.Condition()
+        self._closed = False
+        self._started = False
+        context = multiprocessing.get_context('spawn')
+        self._slots = [WorkerSlot(index, context, load_model, input_bytes, max_rows, dimension, threads)
+                       for index in range(workers)]
+        for slot in self._slots:
+            slot.start()
+        self._collector = threading.Thread(target=self._collect, name='embedding-pool-results', daemon=True)
+        self._collector.start()
+
+        with self._condition:
+            started = self._condition.wait_for(
+                lambda: all(slot.ready or slot.error for slot in self._slots), timeout=start_timeout)
+        failed = [slot.error for slot in self._slots if slot.error]
+        if not started or failed:
+            self.close()
+            raise RuntimeError(f'Embedding workers did not start: {failed[0] if failed else "timed out"}')
+        self._started = True
+
+    def encode(self, texts, lane='ingest', timeout=None):
+        # The timeout counts from the moment a worker picks up a batch, a worker that overruns it is restarted
+        timeout = timeout or self.task_timeout
+        futures = [self.submit(batch, lane, timeout) for batch in self._batches(texts)]
+        if not futures:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return np.concatenate([future.result() for future in futures])
+
+    def submit(self, texts, lane='ingest', timeout=None):
+        task = EmbeddingTask(texts, lane, timeout)
+        with self._condition:
+            if self._closed:
+                raise PoolClosed('Embedding worker pool is closed')
+            if self._unavailable():
+                raise RuntimeError(f'No embedding workers are running: {self._failures()}')
+            self._pending[lane].append(task)
+            self._dispatch()
+        return task.future
+
+    def stats(self):
+        with self._condition:
+            return {
+                'workers': len(self._slots),
+                'busy': {lane: sum(1 for slot in self._slots if slot.task and slot.task.lane == lane) for lane in LANES},
+                'pending': {lane: len(tasks) for lane, tasks in self._pending.items()},
+                'completed': {lane: dict(counts) for lane, counts in self.completed.items()},
+                'failed': self._failures()
+            }
+
+    def close(self, timeout=10):
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            pending = [task for tasks in self._pending.values() for task in tasks]
+            for tasks in self._pending.values():
+                tasks.clear()
+        for task in pending:
+            task.future.set_exception(PoolClosed('Embedding worker pool is closed'))
+        self._collector.join(timeout)
+        for slot in self._slots:
+            slot.stop(timeout)
+        for slot in self._slots:
+            if slot.task:
+                slot.task.future.set_exception(PoolClosed('Embedding worker pool is closed'))
+            slot.release()
+
+    def _batches(self, texts):
+        batch, size = [], 0
+        for text in texts:
+            data = text.encode('utf-8')[:self.input_bytes]
+            if batch and (len(batch) == self.max_rows or size + len(data) > self.input_bytes):
+                yield batch
+                batch, size = [], 0
+            batch.append(data)
+            size += len(data)
+        if batch:
+            yield batch
+
+    def _next_task(self):
+        if self._pending['search']:
+            return self._pending['search'].popleft()
+        busy_ingest = sum(1 for slot in self._slots if slot.task and slot.task.lane == 'ingest')
+        if self._pending['ingest'] and busy_ingest < self.max_ingest_workers:
+            return self._pending['ingest'].popleft()
+        return None
+
+    def _dispatch(self):
+        for slot in self._slots:
+            if slot.task is not None or not slot.ready:
+                continue
+            task = self._next_task()
+            if task is None:
+                return
+            slot.assign(task)
+
+    def _unavailable(self):
+        return self._started and all(slot.error for slot in self._slots)
+
+    def _failures(self):
+        return {slot.index: slot.error for slot in self._slots if slot.error}
+
+    def _collect(self):
+        next_check = time.monotonic() + self.check_interval
+        while not self._closed:
+            with self._condition:
+                connections = {slot.connection: slot for slot in self._slots if not slot.error}
+            for connection in wait(list(connections), timeout=max(next_check - time.monotonic(), 0)):
+                try:
+                    message = connection.recv()
+                except (EOFError, OSError):
+                    # The worker exited, reap it so the health check below sees its exit code
+                    connections[connection].process.join(1)
+                    next_check = 0
+                    continue
+                self._handle(connections[connection], message)
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + self.check_interval
+
+    def _handle(self, slot, message):
+        kind, payload = message
+        index, failed = slot.index, []
+        with self._condition:
+            task, result = slot.task, None
+            if kind == 'ready':
+                slot.ready = True
+            elif task is None:
+                failed = self._worker_failed(slot, payload)
+            else:
+                slot.task = None
+                if kind == 'done':
+                    result = slot.output[:len(task.texts)].copy()
+                    self.completed[task.lane]['tasks'] += 1
+                    self.completed[task.lane]['texts'] += len(task.texts)
+            if not self._closed:
+                self._dispatch()
+            self._condition.notify_all()
+
+        if task is not None and kind == 'done':
+            task.future.set_result(result)
+        elif task is not None:
+            task.future.set_exception(RuntimeError(f'Embedding worker {index} failed: {payload}'))
+        for pending, error in failed:
+            pending.future.set_exception(error)
+
+    def _worker_failed(self, slot, error):
+        slot.error = error
+        if not self._started:
+            logger.error(f'Embedding worker {slot.index} failed to start: {error}')
+            return []
+        logger.error(f'Embedding worker {slot.index} failed to start after a restart: {error}')
+        if not self._unavailable():
+            return []
+        # Nothing is left to pick up queued batches, fail them instead of letting callers wait forever
+        pending = [task for tasks in self._pending.values() for task in tasks]
+        for tasks in self._pending.values():
+            tasks.clear()
+        return [(task, RuntimeError(f'No embedding workers are running: {self._failures()}')) for task in pending]
+
+    def _check_workers(self):
+        now, failed = time.monotonic(), []
+        with self._condition:
+            if self._closed:
+                return
+            for slot in self._slots:
+                if not slot.ready and not slot.error and slot.process.exitcode is not None:
+                    failed.extend(self._worker_failed(slot, f'exited with code {slot.process.exitcode} while loading the model'))
+                    self._condition.notify_all()
+                elif slot.ready and not slot.process.is_alive():
+                    logger.error(f'Embedding worker {slot.index} exited with code {slot.process.exitcode}, restarting it')
+                    if slot.task:
+                        failed.append((slot.task, RuntimeError('Embedding worker exited while encoding')))
+                    slot.restart()
+                elif slot.task and slot.deadline is not None and now > slot.deadline:
+                    logger.error(f'Embedding worker {slot.index} did not finish within {slot.task.timeout}s, restarting it')
+                    failed.append((slot.task, EncodeTimeout(f'Embedding worker {slot.index} timed out after {slot.task.timeout}s')))
+                    slot.restart()
+        for task, error in failed:
+            task.future.set_exception(error)
+
+
+def worker_main(load_model, memory_name, input_bytes, max_rows, dimension, threads, connection):
+    memory = shared_memory.SharedMemory(name=memory_name)
+    inputs = np.ndarray((input_bytes,), dtype=np.uint8, buffer=memory.buf)
+    outputs = np.ndarray((max_rows, dimension), dtype=np.float32, buffer=memory.buf, offset=input_bytes)
+    try:
+        model = load_model(threads)
+        model.encode(['warm up'])
+    except Exception as e:
+        connection.send(('error', repr(e)))
+        return
+    connection.send(('ready', None))
+
+    while True:
+        try:
+            lengths = connection.recv()
+        except EOFError:
+            break
+        if lengths is None:
+            break
+        try:
+            data = inputs[:sum(lengths)].tobytes()
+            texts, offset = [], 0
+            for length in lengths:
+                texts.append(data[offset:offset + length].decode('utf-8', errors='ignore'))
+                offset += length
+            outputs[:len(texts)] = model.encode(texts, batch_size=len(texts))
+            connection.send(('done', None))
+        except Exception as e:
+            connection.send(('error', repr(e)))
+
+    del inputs, outputs
+    memory.close()
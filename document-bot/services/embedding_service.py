@@ -1,25 +1,251 @@
+import hashlib
+import queue
+import threading
+import time
 import warnings
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import partial
 
-from langchain_text_splitters import SentenceTransformersTokenTextSplitter
-from sentence_transformers import SentenceTransformer
+import configs.env as env
+import numpy as np
+from services.chunker import TokenChunker
+from services.executor_service import cpu_executor
+from services.startup import Lazy, timed
 
 warnings.filterwarnings("ignore", category=FutureWarning, message=".*resume_download.*")
 
 
-splitter = SentenceTransformersTokenTextSplitter(chunk_overlap=5, model_name='sentence-transformers/all-mpnet-base-v2', tokens_per_chunk=128)
-transformer = SentenceTransformer('all-MiniLM-L6-v2')
+class EmbeddingCache:
+    def __init__(self, model_name, max_size):
+        self.model_name = model_name
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, text):
+        normalized = ' '.join(text.split())
+        return hashlib.sha256(f'{self.model_name}\x00{normalized}'.encode('utf-8')).digest()
+
+    def get(self, text):
+        key = self.key(text)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, text, embedding):
+        key = self.key(text)
+        embedding = np.array(embedding, dtype=np.float32)
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses}
+
+
+class MicroBatcher:
+    def __init__(self, encode, max_batch_size, max_wait_ms):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.total_queue_delay = 0.0
+        self.max_queue_delay = 0.0
+        self._encode = encode
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, text):
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        self._ensure_started()
+        return future
+
+    def stats(self):
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'items': self.items,
+                'avg_batch_size': self.items / self.batches if self.batches else 0.0,
+                'largest_batch': self.largest_batch,
+                'avg_queue_delay_ms': 1000 * self.total_queue_delay / self.items if self.items else 0.0,
+                'max_queue_delay_ms': 1000 * self.max_queue_delay
+            }
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='query-batcher', daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            self._record(batch, started)
+            try:
+                embeddings = self._encode([text for text, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+
+    def _record(self, batch, started):
+        delays = [started - enqueued for _, _, enqueued in batch]
+        with self._lock:
+            self.batches += 1
+            self.items += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            self.total_queue_delay += sum(delays)
+            self.max_queue_delay = max(self.max_queue_delay, max(delays))
+
+
+def load_splitter():
+    from schemas.collection_specs import CHUNK_MAX_LENGTH
+    return TokenChunker.from_pretrained(env.EMBEDDING_MODEL_NAME, tokens_per_chunk=128, chunk_overlap=5,
+                                        max_bytes=CHUNK_MAX_LENGTH)
+
+def load_transformer(threads=None):
+    if env.EMBEDDING_BACKEND == 'onnx':
+        from services.onnx_embedder import OnnxEmbedder
+        return OnnxEmbedder.from_directory(env.ONNX_MODEL_DIR, env.ONNX_QUANTIZED, threads or env.ONNX_INTRA_OP_THREADS)
+    from sentence_transformers import SentenceTransformer
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+    return SentenceTransformer(env.EMBEDDING_MODEL_NAME)
+
+def load_embedding_pool():
+    from services.embedding_pool import EmbeddingWorkerPool
+    return EmbeddingWorkerPool(
+        load_model=load_transformer,
+        workers=env.EMBEDDING_WORKERS,
+        max_ingest_workers=env.EMBEDDING_POOL_INGEST_WORKERS or max(1, env.EMBEDDING_WORKERS - 1),
+        max_rows=env.BATCH_SIZE,
+        input_bytes=env.EMBEDDING_POOL_INPUT_BYTES,
+        dimension=env.DIMENSION,
+        threads=env.EMBEDDING_WORKER_THREADS,
+        start_timeout=env.EMBEDDING_POOL_START_TIMEOUT,
+        task_timeout=env.EMBEDDING_POOL_TASK_TIMEOUT,
+        check_interval=env.EMBEDDING_POOL_CHECK_INTERVAL
+    )
+
+splitter = Lazy('tokenizer', load_splitter)
+transformer = Lazy('embedding model', load_transformer)
+embedding_pool = Lazy('embedding workers', load_embedding_pool)
+# Queries and titles, document and lecture chunks go to their own cache so bulk ingest cannot evict them
+embedding_cache = EmbeddingCache(env.EMBEDDING_MODEL_NAME, env.EMBEDDING_CACHE_SIZE)
+ingest_cache = EmbeddingCache(env.EMBEDDING_MODEL_NAME, env.INGEST_EMBEDDING_CACHE_SIZE)
+
+def transformer_encode(data, **kwargs):
+    return transformer().encode(data, **kwargs)
+
+def encode(data, lane='ingest'):
+    if env.EMBEDDING_WORKERS:
+        return embedding_pool.encode(data, lane).tolist()
+    return cpu_executor.call(transformer_encode, data, batch_size=len(data)).tolist()
+
+query_batcher = MicroBatcher(partial(encode, lane='search'), env.QUERY_BATCH_SIZE, env.QUERY_BATCH_WAIT_MS)
+
+def warm_up():
+    splitter()
+    if env.EMBEDDING_WORKERS:
+        embedding_pool()
+        return
+    transformer()
+    with timed('warm-up encode'):
+        encode(['warm up'])
+
+def embedding_stats():
+    return {
+        'query_batcher': query_batcher.stats(),
+        'embedding_cache': embedding_cache.stats(),
+        'ingest_cache': ingest_cache.stats(),
+        'embedding_pool': embedding_pool.stats() if embedding_pool.initialized() else None
+    }
+
+def shutdown_embeddings():
+    if embedding_pool.initialized():
+        embedding_pool.close()
 
 def embed_insert(data):
-    return transformer.encode(data).tolist()
+    return embed_batch([data])[0]
 
 def embed_search(data):
-    return transformer.encode([data])
+    embedding = embedding_cache.get(data)
+    if embedding is None:
+        embedding = query_batcher.submit(data).result()
+        embedding_cache.put(data, embedding)
+    return np.array([embedding], dtype=np.float32)
+
+def embed_batch(data, batch_size=env.BATCH_SIZE, cache=None):
+    cache = embedding_cache if cache is None else cache
+    embeddings = [cache.get(text) for text in data]
+    embeddings = [None if embedding is None else embedding.tolist() for embedding in embeddings]
+    missing = [index for index, embedding in enumerate(embeddings) if embedding is None]
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        encoded = encode([data[index] for index in batch])
+        for index, embedding in zip(batch, encoded):
+            cache.put(data[index], embedding)
+            embeddings[index] = embedding
+    return embeddings
+
+def embed_chunks(data_chunks, known_embeddings=None, batch_size=env.BATCH_SIZE):
+    known_embeddings = known_embeddings or {}
+    embeddings = [known_embeddings.get(chunk_hash) for _, _, chunk_hash in data_chunks]
+    missing = [index for index, embedding in enumerate(embeddings) if embedding is None]
+    encoded = embed_batch([data_chunks[index][1] for index in missing], batch_size, ingest_cache)
+    for index, embedding in zip(missing, encoded):
+        embeddings[index] = embedding
+    return embeddings
+
+def content_hash(text):
+    return hashlib.sha256(' '.join(text.split()).encode('utf-8')).hexdigest()
 
 def chunk(text):
     data_chunks = []
-    split_result = splitter.split_text(text=text)
+    split_result = splitter().split_text(text)
     chunk_id = 1 
     for chunk_txt in split_result:
-        data_chunks.append((chunk_id, chunk_txt))
+        data_chunks.append((chunk_id, chunk_txt, content_hash(chunk_txt)))
         chunk_id += 1
     return data_chunks
+
+def chunk_batches(text, batch_size=env.BATCH_SIZE, known_embeddings=None):
+    return embed_chunk_batches(chunk(text), batch_size, known_embeddings)
+
+def embed_chunk_batches(data_chunks, batch_size=env.BATCH_SIZE, known_embeddings=None):
+    for start in range(0, len(data_chunks), batch_size):
+        batch = data_chunks[start:start + batch_size]
+        chunk_ids = [chunk_id for chunk_id, _, _ in batch]
+        chunk_txts = [chunk_txt for _, chunk_txt, _ in batch]
+        yield chunk_ids, chunk_txts, embed_chunks(batch, known_embeddings, batch_size)
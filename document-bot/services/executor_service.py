@@ -0,0 +1,45 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import configs.env as env
+
+
+class ExecutorSaturated(Exception):
+    pass
+
+class BoundedExecutor:
+    def __init__(self, name, max_workers, queue_depth):
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'{name}-pool')
+        self._slots = threading.BoundedSemaphore(max_workers + queue_depth)
+
+    def submit(self, fn, *args, blocking=True, **kwargs):
+        if not self._slots.acquire(blocking=blocking):
+            raise ExecutorSaturated(f"The {self.name} pool is saturated, try again later")
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def call(self, fn, *args, **kwargs):
+        return self.submit(fn, *args, **kwargs).result()
+
+    async def run(self, fn, *args, **kwargs):
+        return await asyncio.wrap_future(self.submit(fn, *args, blocking=False, **kwargs))
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+# CPU-bound model inference only; jobs here must never submit to cpu_executor themselves
+cpu_executor = BoundedExecutor('cpu', env.CPU_POOL_SIZE, env.CPU_QUEUE_DEPTH)
+# Blocking Milvus/HTTP calls issued from async routes
+io_executor = BoundedExecutor('io', env.IO_POOL_SIZE, env.IO_QUEUE_DEPTH)
+
+def shutdown_executors():
+    io_executor.shutdown()
+    cpu_executor.shutdown()
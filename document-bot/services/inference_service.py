@@ -0,0 +1,84 @@
+import asyncio
+import importlib.util
+import logging
+import os
+import random
+
+import configs.env as env
+import httpx
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = (429, 503)
+
+
+class InferenceClient:
+    def __init__(self, base_url, timeout, max_connections, max_concurrency, max_retries, backoff_base, backoff_max,
+                 transport=None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.transport = transport
+        self._client = None
+        self._semaphore = None
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=importlib.util.find_spec('h2') is not None,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                transport=self.transport
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        delay = min(self.backoff_base * 2 ** attempt, self.backoff_max)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def post(self, model, payload, timeout=None):
+        client = self._get_client()
+        headers = {"Authorization": f"Bearer {os.environ['DOCUBOT_ACCESS_TOKEN']}"}
+        for attempt in range(self.max_retries + 1):
+            try:
+                # Only the request itself holds a slot, a call backing off leaves it to the others
+                async with self._semaphore:
+                    response = await client.post(f"/{model}", headers=headers, json=payload,
+                                                 timeout=timeout or self.timeout)
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f'Inference call to {model} failed ({e!r}), retrying in {delay:.2f}s')
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    return response
+                delay = self._backoff(attempt, response)
+                logger.warning(f'Inference call to {model} returned {response.status_code}, retrying in {delay:.2f}s')
+            await asyncio.sleep(delay)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+inference_client = InferenceClient(
+    base_url=env.INFERENCE_API_URL,
+    timeout=env.INFERENCE_TIMEOUT,
+    max_connections=env.INFERENCE_MAX_CONNECTIONS,
+    max_concurrency=env.INFERENCE_MAX_CONCURRENCY,
+    max_retries=env.INFERENCE_MAX_RETRIES,
+    backoff_base=env.INFERENCE_BACKOFF_BASE,
+    backoff_max=env.INFERENCE_BACKOFF_MAX
+)
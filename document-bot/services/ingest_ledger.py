@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import configs.env as env
+
+
+class IngestLedger:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS ingested ('
+                'transaction_id TEXT PRIMARY KEY, project_id INTEGER, document_id INTEGER, version INTEGER, '
+                'ingested_at TEXT)'
+            )
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS ingested_version ON ingested (project_id, document_id, version)'
+            )
+            self._connection.commit()
+        return self._connection
+
+    def contains(self, transaction_id, project_id, document_id, version):
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT 1 FROM ingested WHERE transaction_id = ? '
+                'OR (project_id = ? AND document_id = ? AND version = ?) LIMIT 1',
+                (transaction_id, int(project_id), int(document_id), int(version))
+            ).fetchone()
+            return row is not None
+
+    def record(self, transaction_id, project_id, document_id, version):
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                'INSERT OR REPLACE INTO ingested VALUES (?, ?, ?, ?, ?)',
+                (transaction_id, int(project_id), int(document_id), int(version), datetime.now().isoformat())
+            )
+            connection.commit()
+
+    def forget(self, project_id, document_id, version):
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                'DELETE FROM ingested WHERE project_id = ? AND document_id = ? AND version = ?',
+                (int(project_id), int(document_id), int(version))
+            )
+            connection.commit()
+
+    def clear(self):
+        with self._lock:
+            connection = self._connect()
+            connection.execute('DELETE FROM ingested')
+            connection.commit()
+
+
+ingest_ledger = IngestLedger(env.INGEST_LEDGER_PATH)
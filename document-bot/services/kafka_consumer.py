@@ -1,42 +1,258 @@
-import sys
-from confluent_kafka import Consumer, KafkaError, KafkaException
-import configs.env as env
 import logging
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import configs.env as env
+from confluent_kafka import Consumer, KafkaError, KafkaException, TopicPartition
 from services import event_service
 from routers import documents
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_saga_consumer = None
 
-def create_consumer(topic: str):
+
+def create_consumer():
     conf = {
         'bootstrap.servers': env.KAFKA_BROKER,
         'group.id': 'orchestrator-group',
-        'auto.offset.reset': 'latest'
+        'auto.offset.reset': 'latest',
+        'enable.auto.commit': False
     }
 
-    consumer = Consumer(conf)
-    consumer.subscribe([topic])
+    return Consumer(conf)
 
-    return consumer
 
+class PartitionOffsets:
+    def __init__(self):
+        self._in_flight = deque()
+        self._completed = set()
 
-def consume_messages(consumer):
-    try:
-        while True:
-            msg = consumer.poll(timeout=1.0)
-            if msg is None: continue
-
-            if msg.error():
-                if msg.error().code() == KafkaError._PARTITION_EOF:
-                    logger.info(f'{msg.topic()} [{msg.partition()}] reached end at offset {msg.offset()}')
-                elif msg.error():
-                    raise KafkaException(msg.error())
-            else:
+    def track(self, offset):
+        self._in_flight.append(offset)
+
+    def complete(self, offset):
+        self._completed.add(offset)
+        committable = None
+        while self._in_flight and self._in_flight[0] in self._completed:
+            committable = self._in_flight.popleft()
+            self._completed.remove(committable)
+        return committable
+
+
+class SagaConsumer:
+    def __init__(self, consumer, handler, batch_handler=None, batch_size=1,
+                 workers=env.KAFKA_CONSUMER_WORKERS, max_in_flight=env.KAFKA_MAX_IN_FLIGHT):
+        self.consumer = consumer
+        self.handler = handler
+        self.batch_handler = batch_handler
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.resume_threshold = max_in_flight // 2
+        self.metrics = {'received': 0, 'processed': 0, 'failed': 0, 'revoked': 0, 'committed': 0, 'in_flight': 0, 'paused': False, 'lag': {}}
+        self._lanes = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'saga-lane-{lane}') for lane in range(workers)]
+        self._offsets = {}
+        self._completions = queue.Queue()
+        self._lock = threading.Lock()
+        self._paused = False
+        self._last_report = time.monotonic()
+        self._last_processed = 0
+
+    def subscribe(self, topics):
+        self.consumer.subscribe(topics, on_assign=self._on_assign, on_revoke=self._on_revoke)
+
+    def run(self):
+        try:
+            while True:
+                msgs = self._receive()
+                self._commit_completed()
+                self._apply_backpressure()
+                self._report_metrics()
+
+                received = []
+                for msg in msgs:
+                    if msg.error():
+                        if msg.error().code() == KafkaError._PARTITION_EOF:
+                            logger.info(f'{msg.topic()} [{msg.partition()}] reached end at offset {msg.offset()}')
+                        elif msg.error():
+                            raise KafkaException(msg.error())
+                    else:
+                        received.append(msg)
+                if received:
+                    self._dispatch(received)
+        finally:
+            for lane in self._lanes:
+                lane.shutdown(wait=True)
+            self._commit_completed()
+            self.consumer.close()
+
+    def _receive(self):
+        if self.batch_handler and self.batch_size > 1:
+            return self.consumer.consume(num_messages=self.batch_size, timeout=1.0)
+        msg = self.consumer.poll(timeout=1.0)
+        return [msg] if msg is not None else []
+
+    def _dispatch(self, msgs):
+        lanes = {}
+        for msg in msgs:
+            partition = (msg.topic(), msg.partition())
+            tracker = self._offsets.setdefault(partition, PartitionOffsets())
+            tracker.track(msg.offset())
+            with self._lock:
+                self.metrics['received'] += 1
+                self.metrics['in_flight'] += 1
+            try:
                 event = event_service.parse_event(msg.value().decode("utf-8"))
-                # print(event)
-                documents.saga_create(event)
-                logger.info(f'Received message: {msg.value().decode("utf-8")}')
-    finally:
-        consumer.close()
+                key = f'{event.payload.projectId}:{event.payload.documentId}' if event.payload else str(msg.partition())
+            except Exception:
+                logger.exception(f'Skipping malformed message at {msg.topic()} [{msg.partition()}] offset {msg.offset()}')
+                self._completions.put((partition, msg.offset(), False, tracker))
+                continue
+            lane = zlib.crc32(key.encode('utf-8')) % len(self._lanes)
+            lanes.setdefault(lane, []).append((partition, msg.offset(), event, tracker))
+
+        for lane, items in lanes.items():
+            if self.batch_handler and len(items) > 1:
+                self._lanes[lane].submit(self._process_batch, items)
+            else:
+                for item in items:
+                    self._lanes[lane].submit(self._process, *item)
+
+    def _revoked(self, partition, tracker):
+        # Revoking a partition drops its tracker, messages dispatched before that are skipped or not committed
+        # since the new owner consumes them again from the last committed offset
+        return self._offsets.get(partition) is not tracker
+
+    def _process_batch(self, items):
+        assigned = []
+        for partition, offset, event, tracker in items:
+            if self._revoked(partition, tracker):
+                self._completions.put((partition, offset, None, tracker))
+            else:
+                assigned.append((partition, offset, event, tracker))
+        if not assigned:
+            return
+        succeeded = False
+        try:
+            self.batch_handler([event for _, _, event, _ in assigned])
+            succeeded = True
+            logger.info(f'Processed batch of {len(assigned)} transactions')
+        except Exception:
+            logger.exception(f'Failed to process batch of {len(assigned)} messages')
+        finally:
+            for partition, offset, _, tracker in assigned:
+                self._completions.put((partition, offset, succeeded, tracker))
+
+    def _process(self, partition, offset, event, tracker):
+        if self._revoked(partition, tracker):
+            self._completions.put((partition, offset, None, tracker))
+            return
+        succeeded = False
+        try:
+            self.handler(event)
+            succeeded = True
+            logger.info(f'Processed transaction {event.transactionId} from {partition[0]} [{partition[1]}] offset {offset}')
+        except Exception:
+            logger.exception(f'Failed to process {partition[0]} [{partition[1]}] offset {offset}')
+        finally:
+            self._completions.put((partition, offset, succeeded, tracker))
+
+    def _commit_completed(self, asynchronous=True):
+        commits = {}
+        while True:
+            try:
+                partition, offset, succeeded, tracker = self._completions.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self.metrics['in_flight'] -= 1
+                if succeeded is None:
+                    self.metrics['revoked'] += 1
+                    continue
+                self.metrics['processed' if succeeded else 'failed'] += 1
+            if self._revoked(partition, tracker):
+                continue
+            committable = tracker.complete(offset)
+            if committable is not None:
+                commits[partition] = committable
+
+        if commits:
+            self.consumer.commit(offsets=[TopicPartition(topic, partition, offset + 1) for (topic, partition), offset in commits.items()],
+                                 asynchronous=asynchronous)
+            with self._lock:
+                self.metrics['committed'] += len(commits)
+                for (topic, partition), offset in commits.items():
+                    self.metrics['lag'][f'{topic}[{partition}]'] = self._lag(topic, partition, offset + 1)
+
+    def _lag(self, topic, partition, next_offset):
+        try:
+            _, high = self.consumer.get_watermark_offsets(TopicPartition(topic, partition), cached=True)
+            return max(high - next_offset, 0)
+        except KafkaException:
+            return None
+
+    def _apply_backpressure(self):
+        in_flight = self.metrics['in_flight']
+        if not self._paused and in_flight >= self.max_in_flight:
+            self.consumer.pause(self.consumer.assignment())
+            self._paused = True
+            logger.info(f'Paused consumption with {in_flight} messages in flight')
+        elif self._paused and in_flight <= self.resume_threshold:
+            self.consumer.resume(self.consumer.assignment())
+            self._paused = False
+            logger.info(f'Resumed consumption with {in_flight} messages in flight')
+        self.metrics['paused'] = self._paused
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.metrics, 'lag': dict(self.metrics['lag'])}
+
+    def _report_metrics(self):
+        now = time.monotonic()
+        elapsed = now - self._last_report
+        if elapsed < env.KAFKA_METRICS_INTERVAL:
+            return
+        with self._lock:
+            processed = self.metrics['processed'] + self.metrics['failed']
+            throughput = (processed - self._last_processed) / elapsed
+            self.metrics['throughput'] = throughput
+            logger.info(f'Saga consumer: {throughput:.2f} msg/s, in flight {self.metrics["in_flight"]}, '
+                        f'processed {self.metrics["processed"]}, failed {self.metrics["failed"]}, lag {self.metrics["lag"]}')
+        self._last_processed = processed
+        self._last_report = now
+
+
+    def _on_assign(self, consumer, partitions):
+        logger.info(f'Assigned partitions: {[(p.topic, p.partition) for p in partitions]}')
+        if self._paused:
+            consumer.pause(partitions)
+
+    def _on_revoke(self, consumer, partitions):
+        revoked = {(p.topic, p.partition) for p in partitions}
+        logger.info(f'Revoked partitions: {sorted(revoked)}')
+        try:
+            self._commit_completed(asynchronous=False)
+        except KafkaException:
+            logger.exception('Failed to commit completed offsets before the rebalance')
+        for partition in revoked:
+            self._offsets.pop(partition, None)
+        with self._lock:
+            for topic, partition in revoked:
+                self.metrics['lag'].pop(f'{topic}[{partition}]', None)
+
+
+def consume_messages(consumer, topic):
+    global _saga_consumer
+    _saga_consumer = SagaConsumer(consumer, documents.saga_create, documents.saga_create_batch,
+                                  batch_size=env.KAFKA_CONSUME_BATCH_SIZE)
+    _saga_consumer.subscribe([topic])
+    _saga_consumer.run()
+
+def consumer_metrics():
+    saga_consumer = _saga_consumer
+    return saga_consumer.snapshot() if saga_consumer else {}
@@ -1,11 +1,68 @@
+import logging
+import threading
+
 import configs.env as env
 from confluent_kafka import Producer
 
+logger = logging.getLogger(__name__)
+
+metrics = {'produced': 0, 'delivered': 0, 'failed': 0}
+
+_producer = None
+_poller = None
+_stopped = threading.Event()
+_lock = threading.Lock()
+
 def create_producer():
     conf = {
-        'bootstrap.servers': env.KAFKA_BROKER
+        'bootstrap.servers': env.KAFKA_BROKER,
+        'linger.ms': env.KAFKA_LINGER_MS,
+        'batch.size': env.KAFKA_PRODUCER_BATCH_SIZE,
+        'compression.type': env.KAFKA_COMPRESSION_TYPE
     }
 
     producer = Producer(conf)
 
-    return producer
\ No newline at end of file
+    return producer
+
+def get_producer():
+    global _producer, _poller
+    with _lock:
+        if _producer is None:
+            _producer = create_producer()
+            _stopped.clear()
+            _poller = threading.Thread(target=_poll_deliveries, args=(_producer,), name='kafka-producer-poll', daemon=True)
+            _poller.start()
+        return _producer
+
+def produce(topic: str, value: str):
+    get_producer().produce(topic, value=value, on_delivery=_on_delivery)
+    with _lock:
+        metrics['produced'] += 1
+
+def producer_metrics():
+    with _lock:
+        return dict(metrics)
+
+def flush_producer(timeout: float = env.KAFKA_FLUSH_TIMEOUT):
+    global _producer, _poller
+    with _lock:
+        producer, poller = _producer, _poller
+        _producer, _poller = None, None
+    if producer is None:
+        return
+    _stopped.set()
+    poller.join()
+    remaining = producer.flush(timeout)
+    if remaining:
+        logger.warning(f'{remaining} message(s) were not delivered before shutdown')
+
+def _poll_deliveries(producer):
+    while not _stopped.is_set():
+        producer.poll(0.1)
+
+def _on_delivery(err, msg):
+    with _lock:
+        metrics['failed' if err else 'delivered'] += 1
+    if err:
+        logger.error(f'Failed to deliver message to {msg.topic()}: {err}')
@@ -0,0 +1,447 @@
+import ast
+import glob
+import importlib
+import importlib.util
+import json
+import logging
+import operator
+import os
+import threading
+from functools import reduce
+
+import configs.env as env
+import numpy as np
+from pymilvus import DataType
+from schemas.collection_specs import SPECS
+from services.vector_store import Hit, VectorStore, as_columns, as_list
+
+logger = logging.getLogger(__name__)
+
+hnswlib = importlib.import_module('hnswlib') if importlib.util.find_spec('hnswlib') else None
+
+COMPARISONS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+ARITHMETIC = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Mod: operator.mod,
+}
+HNSW_SPACES = {'L2': 'l2', 'IP': 'ip', 'COSINE': 'cosine'}
+
+
+def parse_filter(expression):
+    normalized = expression.replace('&&', ' and ').replace('||', ' or ')
+    return ast.parse(normalized.strip(), mode='eval').body
+
+def evaluate_filter(node, columns):
+    if isinstance(node, ast.BoolOp):
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        return reduce(combine, [evaluate_filter(value, columns) for value in node.values])
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        return np.logical_not(evaluate_filter(node.operand, columns))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        return -evaluate_filter(node.operand, columns)
+    if isinstance(node, ast.Compare):
+        result = True
+        left = evaluate_filter(node.left, columns)
+        for op, comparator in zip(node.ops, node.comparators):
+            right = evaluate_filter(comparator, columns)
+            if isinstance(op, (ast.In, ast.NotIn)):
+                matched = np.isin(left, right)
+                value = matched if isinstance(op, ast.In) else np.logical_not(matched)
+            elif type(op) in COMPARISONS:
+                value = COMPARISONS[type(op)](left, right)
+            else:
+                raise ValueError(f'Unsupported comparison in filter: {type(op).__name__}')
+            result = np.logical_and(result, value)
+            left = right
+        return result
+    if isinstance(node, ast.BinOp) and type(node.op) in ARITHMETIC:
+        return ARITHMETIC[type(node.op)](evaluate_filter(node.left, columns), evaluate_filter(node.right, columns))
+    if isinstance(node, ast.Name):
+        if node.id in columns:
+            return columns[node.id]
+        if node.id in ('true', 'false'):
+            return node.id == 'true'
+        raise ValueError(f'Unknown field in filter: {node.id}')
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [evaluate_filter(element, columns) for element in node.elts]
+    raise ValueError(f'Unsupported filter expression: {ast.dump(node)}')
+
+def normalize_score(distance, metric_type):
+    if metric_type == 'L2':
+        return 1 - 2 * np.arctan(distance) / np.pi
+    if metric_type == 'IP':
+        return 0.5 + np.arctan(distance) / np.pi
+    return (1 + distance) / 2
+
+
+class LocalCollection:
+    def __init__(self, spec, directory):
+        self.spec = spec
+        self.directory = os.path.join(directory, spec.name)
+        self.primary = next(field for field in spec.fields if field.is_primary)
+        self.dimensions = {field.name: field.params['dim'] for field in spec.fields if field.dtype == DataType.FLOAT_VECTOR}
+        self.scalar_fields = [field.name for field in spec.fields
+                              if field.dtype != DataType.FLOAT_VECTOR and not field.is_primary]
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._open()
+
+    def __len__(self):
+        return len(self._positions)
+
+    def _reset(self):
+        self._generation = 0
+        self._size = 0
+        self._next_id = 1
+        self._ids = []
+        self._positions = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._scalars = {field_name: [] for field_name in self.scalar_fields}
+        self._vectors = {field_name: np.zeros((0, dim), dtype=np.float32) for field_name, dim in self.dimensions.items()}
+        self._arrays = None
+        self._indexes = {}
+
+    def _open(self):
+        self._reset()
+        self.dirty = False
+        rows_path = os.path.join(self.directory, 'rows.json')
+        if not os.path.exists(rows_path):
+            return
+        with open(rows_path, 'r', encoding='utf-8') as file:
+            state = json.load(file)
+
+        self._generation = state['generation']
+        self._next_id = state['next_id']
+        self._ids = state['ids']
+        self._scalars = state['columns']
+        self._size = len(self._ids)
+        self._positions = {pk: row for row, pk in enumerate(self._ids)}
+        self._alive = np.ones(self._size, dtype=bool)
+        for field_name in self.dimensions:
+            vectors = np.load(self._vector_path(field_name, self._generation), mmap_mode='r')
+            if len(vectors) != self._size:
+                raise ValueError(f'{self.spec.name}.{field_name} has {len(vectors)} vectors for {self._size} rows')
+            self._vectors[field_name] = vectors
+
+    def _vector_path(self, field_name, generation):
+        return os.path.join(self.directory, f'{field_name}-{generation:06d}.npy')
+
+    def flush(self):
+        # Only the snapshot is taken under the collection lock, writers and searches continue while it is written
+        with self._flush_lock:
+            with self._lock:
+                if not self.dirty:
+                    return
+                rows = np.flatnonzero(self._alive[:self._size])
+                generation = self._generation + 1
+                vectors = {field_name: np.asarray(self._vectors[field_name][rows], dtype=np.float32)
+                           for field_name in self.dimensions}
+                state = {
+                    'generation': generation,
+                    'next_id': self._next_id,
+                    'ids': [self._ids[row] for row in rows],
+                    'columns': {field_name: [column[row] for row in rows] for field_name, column in self._scalars.items()},
+                }
+                self._generation = generation
+                self.dirty = False
+                if len(rows) < self._size - len(rows):
+                    self._compact(vectors, state)
+
+            try:
+                self._write(generation, vectors, state)
+            except Exception:
+                with self._lock:
+                    self.dirty = True
+                raise
+
+    def _write(self, generation, vectors, state):
+        os.makedirs(self.directory, exist_ok=True)
+        for field_name, field_vectors in vectors.items():
+            path = self._vector_path(field_name, generation)
+            with open(path + '.tmp', 'wb') as file:
+                np.save(file, field_vectors)
+            os.replace(path + '.tmp', path)
+
+        rows_path = os.path.join(self.directory, 'rows.json')
+        with open(rows_path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(state, file)
+        os.replace(rows_path + '.tmp', rows_path)
+
+        for path in glob.glob(os.path.join(self.directory, '*.npy')):
+            if not path.endswith(f'-{generation:06d}.npy'):
+                os.remove(path)
+
+    def _compact(self, vectors, state):
+        # Deleted rows outnumber live ones, drop them from memory as well, the indexes are rebuilt on the next search
+        self._ids = list(state['ids'])
+        self._scalars = {field_name: list(column) for field_name, column in state['columns'].items()}
+        self._size = len(self._ids)
+        self._positions = {pk: row for row, pk in enumerate(self._ids)}
+        self._alive = np.ones(self._size, dtype=bool)
+        self._vectors = {field_name: field_vectors.copy() for field_name, field_vectors in vectors.items()}
+        self._arrays = None
+        self._indexes = {}
+
+    def clear(self):
+        with self._lock:
+            generation = self._generation
+            self._reset()
+            self._generation = generation
+            self.dirty = True
+
+    def insert(self, columns):
+        size = len(next(iter(columns.values())))
+        if size == 0:
+            return {'insert_count': 0, 'ids': []}
+        with self._lock:
+            if self.primary.auto_id:
+                ids = list(range(self._next_id, self._next_id + size))
+            else:
+                ids = [int(pk) for pk in columns[self.primary.name]]
+            self.delete(ids)
+
+            start, end = self._size, self._size + size
+            self._reserve(end)
+            for field_name in self.dimensions:
+                self._vectors[field_name][start:end] = np.asarray(columns[field_name], dtype=np.float32)
+            for field_name, column in self._scalars.items():
+                column.extend(columns[field_name])
+            self._ids.extend(ids)
+            self._alive[start:end] = True
+            self._positions.update((pk, row) for row, pk in enumerate(ids, start))
+            self._size = end
+            self._next_id = max(self._next_id, max(ids) + 1)
+            self._arrays = None
+            self.dirty = True
+
+            for field_name, (index, _) in self._indexes.items():
+                if index.get_max_elements() < end:
+                    index.resize_index(len(self._alive))
+                index.add_items(self._vectors[field_name][start:end], np.arange(start, end))
+            return {'insert_count': size, 'ids': ids}
+
+    def _reserve(self, size):
+        capacity = len(self._alive)
+        if size <= capacity and all(vectors.flags.writeable for vectors in self._vectors.values()):
+            return
+        capacity = max(size, 2 * capacity, 1024)
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._alive = alive
+        for field_name, dim in self.dimensions.items():
+            vectors = np.zeros((capacity, dim), dtype=np.float32)
+            vectors[:self._size] = self._vectors[field_name][:self._size]
+            self._vectors[field_name] = vectors
+
+    def delete(self, pks):
+        with self._lock:
+            deleted = 0
+            for pk in as_list(pks):
+                row = self._positions.pop(int(pk), None)
+                if row is None:
+                    continue
+                self._alive[row] = False
+                for index, _ in self._indexes.values():
+                    index.mark_deleted(row)
+                deleted += 1
+            if deleted:
+                self._arrays = None
+                self.dirty = True
+            return {'delete_count': deleted}
+
+    def get(self, ids, output_fields=None):
+        with self._lock:
+            rows = [self._positions[int(pk)] for pk in as_list(ids) if int(pk) in self._positions]
+            return [self._entity(row, output_fields, primary=True) for row in rows]
+
+    def query(self, filter='', output_fields=None, limit=None):
+        with self._lock:
+            rows = np.flatnonzero(self._mask(filter))
+            if limit is not None:
+                rows = rows[:limit]
+            return [self._entity(row, output_fields, primary=True) for row in rows]
+
+    def search(self, data, anns_field, filter='', limit=10, output_fields=None, search_params=None):
+        search_params = search_params or self.spec.search_params(anns_field)
+        metric_type = search_params.get('metric_type', env.METRIC_TYPE)
+        queries = np.asarray(data, dtype=np.float32).reshape(-1, self.dimensions[anns_field])
+        with self._lock:
+            if filter or not self._use_index():
+                rows, distances = self._brute_force(anns_field, queries, self._mask(filter), limit, metric_type)
+            else:
+                rows, distances = self._ann(anns_field, queries, limit, metric_type, search_params.get('params', {}))
+            return [
+                [Hit(id=self._ids[row], distance=float(distance), entity=self._entity(row, output_fields or []))
+                 for row, distance in zip(query_rows, query_distances)]
+                for query_rows, query_distances in zip(rows, distances)
+            ]
+
+    def hybrid_search(self, reqs, ranker, limit=10, output_fields=None):
+        ranking = ranker.dict()
+        scores = {}
+        with self._lock:
+            for position, req in enumerate(reqs):
+                hits = self.search(req.data, req.anns_field, req.expr or '', req.limit, [], req.param)[0]
+                metric_type = req.param.get('metric_type', env.METRIC_TYPE)
+                for rank, hit in enumerate(hits):
+                    if ranking['strategy'] == 'rrf':
+                        score = 1 / (ranking['params']['k'] + rank + 1)
+                    else:
+                        score = ranking['params']['weights'][position] * normalize_score(hit.distance, metric_type)
+                    scores[hit.id] = scores.get(hit.id, 0.0) + score
+
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+            return [[Hit(id=pk, distance=float(score), entity=self._entity(self._positions[pk], output_fields or []))
+                     for pk, score in ranked]]
+
+    def _entity(self, row, output_fields, primary=False):
+        field_names = output_fields if output_fields is not None else self.scalar_fields + list(self.dimensions)
+        entity = {self.primary.name: self._ids[row]} if primary else {}
+        for field_name in field_names:
+            if field_name in self._scalars:
+                entity[field_name] = self._scalars[field_name][row]
+            elif field_name in self.dimensions:
+                entity[field_name] = self._vectors[field_name][row].tolist()
+            elif field_name == self.primary.name:
+                entity[field_name] = self._ids[row]
+        return entity
+
+    def _mask(self, filter):
+        alive = self._alive[:self._size]
+        if not filter or not self._size:
+            return alive
+        if self._arrays is None:
+            self._arrays = {field_name: np.asarray(column, dtype=object if isinstance(column[0], str) else None)
+                            for field_name, column in self._scalars.items() if column}
+            self._arrays[self.primary.name] = np.asarray(self._ids, dtype=np.int64)
+        matched = evaluate_filter(parse_filter(filter), self._arrays)
+        return alive & np.broadcast_to(np.asarray(matched, dtype=bool), alive.shape)
+
+    def _brute_force(self, anns_field, queries, candidates, limit, metric_type):
+        rows = np.flatnonzero(candidates)
+        if len(rows) == 0:
+            return [[] for _ in queries], [[] for _ in queries]
+
+        vectors = np.asarray(self._vectors[anns_field][rows])
+        if metric_type == 'L2':
+            distances = (queries ** 2).sum(axis=1)[:, None] - 2 * queries @ vectors.T + (vectors ** 2).sum(axis=1)[None, :]
+            distances = np.maximum(distances, 0)
+            keys = distances
+        else:
+            if metric_type == 'COSINE':
+                queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+                vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            distances = queries @ vectors.T
+            keys = -distances
+
+        k = min(limit, len(rows))
+        nearest = np.argpartition(keys, k - 1, axis=1)[:, :k]
+        nearest = np.take_along_axis(nearest, np.take_along_axis(keys, nearest, axis=1).argsort(axis=1), axis=1)
+        return rows[nearest], np.take_along_axis(distances, nearest, axis=1)
+
+    def _use_index(self):
+        return hnswlib is not None and env.LOCAL_STORE_ANN and len(self._positions) >= env.LOCAL_STORE_ANN_MIN_ROWS
+
+    def _ann(self, anns_field, queries, limit, metric_type, params):
+        index = self._index(anns_field, metric_type)
+        k = min(limit, len(self._positions))
+        index.set_ef(max(params.get('ef', 64), k))
+        rows, distances = index.knn_query(queries, k=k)
+        if metric_type != 'L2':
+            distances = 1 - distances
+        return rows.astype(np.int64), distances
+
+    def _index(self, anns_field, metric_type):
+        index, indexed_metric = self._indexes.get(anns_field, (None, None))
+        if index is None or indexed_metric != metric_type:
+            rows = np.flatnonzero(self._alive[:self._size])
+            index = hnswlib.Index(space=HNSW_SPACES[metric_type], dim=self.dimensions[anns_field])
+            index.init_index(max_elements=max(len(self._alive), 1), M=env.LOCAL_STORE_HNSW_M,
+                             ef_construction=env.LOCAL_STORE_HNSW_EF_CONSTRUCTION)
+            index.add_items(np.asarray(self._vectors[anns_field][rows]), rows)
+            self._indexes[anns_field] = (index, metric_type)
+        return index
+
+
+class LocalVectorStore(VectorStore):
+    def __init__(self, directory, flush_interval):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._collections = {name: LocalCollection(spec, directory) for name, spec in SPECS.items()}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def collection(self, collection_name):
+        if collection_name not in self._collections:
+            raise ValueError(f'Collection {collection_name} does not exist')
+        return self._collections[collection_name]
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='local-store-flush', daemon=True)
+            self._thread.start()
+
+    def ready(self):
+        return True
+
+    def status(self):
+        return {name: {'state': 'loaded', 'error': None} for name in self._collections}
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def flush(self):
+        for collection in self._collections.values():
+            collection.flush()
+
+    def insert(self, collection_name, data):
+        return self.insert_columns(collection_name, as_columns(data))
+
+    def insert_columns(self, collection_name, columns):
+        return self.collection(collection_name).insert(columns)
+
+    def upsert(self, collection_name, data):
+        return self.insert(collection_name, data)
+
+    def get(self, collection_name, ids, output_fields=None):
+        return self.collection(collection_name).get(ids, output_fields)
+
+    def delete(self, collection_name, pks):
+        return self.collection(collection_name).delete(pks)
+
+    def query(self, collection_name, filter='', output_fields=None, limit=None):
+        return self.collection(collection_name).query(filter, output_fields, limit)
+
+    def search(self, collection_name, data, anns_field, filter='', limit=10, output_fields=None, search_params=None):
+        return self.collection(collection_name).search(data, anns_field, filter, limit, output_fields, search_params)
+
+    def hybrid_search(self, collection_name, reqs, ranker, limit=10, output_fields=None):
+        return self.collection(collection_name).hybrid_search(reqs, ranker, limit, output_fields)
+
+    def get_collection_stats(self, collection_name):
+        return {'row_count': len(self.collection(collection_name))}
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            for name, collection in self._collections.items():
+                try:
+                    collection.flush()
+                except Exception:
+                    logger.exception(f'Could not flush local collection {name}')
@@ -1,5 +1,57 @@
 import configs.env as env
-from pymilvus import Collection, MilvusClient, connections
+from pymilvus import MilvusClient, connections
+from services.collection_manager import collection_manager, get_collection
+from services.startup import Lazy
+from services.vector_store import VectorStore
+
+
+class MilvusStore(VectorStore):
+    def __init__(self, client):
+        self.client = client
+
+    def start(self):
+        collection_manager.start()
+
+    def ready(self):
+        return collection_manager.ready()
+
+    def status(self):
+        return collection_manager.status()
+
+    def close(self):
+        collection_manager.stop()
+
+    def insert(self, collection_name, data):
+        return self.client.insert(collection_name=collection_name, data=data)
+
+    def insert_columns(self, collection_name, columns):
+        collection = get_collection(collection_name)
+        field_names = [field.name for field in collection.schema.fields if not field.auto_id]
+        return collection.insert([columns[field_name] for field_name in field_names])
+
+    def upsert(self, collection_name, data):
+        return self.client.upsert(collection_name=collection_name, data=data)
+
+    def get(self, collection_name, ids, output_fields=None):
+        return self.client.get(collection_name=collection_name, ids=ids, output_fields=output_fields)
+
+    def delete(self, collection_name, pks):
+        return self.client.delete(collection_name=collection_name, pks=pks)
+
+    def query(self, collection_name, filter='', output_fields=None, limit=None):
+        kwargs = {'limit': limit} if limit is not None else {}
+        return self.client.query(collection_name=collection_name, filter=filter, output_fields=output_fields, **kwargs)
+
+    def search(self, collection_name, data, anns_field, filter='', limit=10, output_fields=None, search_params=None):
+        return self.client.search(collection_name=collection_name, data=data, anns_field=anns_field, filter=filter,
+                                  limit=limit, output_fields=output_fields, search_params=search_params)
+
+    def hybrid_search(self, collection_name, reqs, ranker, limit=10, output_fields=None):
+        collection = collection_manager.get(collection_name)
+        return collection.hybrid_search(reqs, ranker, limit=limit, output_fields=output_fields)
+
+    def get_collection_stats(self, collection_name):
+        return self.client.get_collection_stats(collection_name=collection_name)
 
 
 def connect_to_milvus():
@@ -9,8 +61,17 @@ def create_milvus_client():
     client = MilvusClient(uri=f"http://{env.MILVUS_HOST}:{env.MILVUS_PORT}", token="root:Milvus")
     return client
 
-def get_collection(collection_name: str):
-    return Collection(name=collection_name)
+def create_vector_store():
+    if env.VECTOR_STORE == 'local':
+        from services.local_vector_store import LocalVectorStore
+        store = LocalVectorStore(env.LOCAL_STORE_DIR, env.LOCAL_STORE_FLUSH_INTERVAL)
+    else:
+        connect_to_milvus()
+        store = MilvusStore(create_milvus_client())
+    store.start()
+    return store
+
+def insert_columns(collection_name: str, columns: dict):
+    return client.insert_columns(collection_name, columns)
 
-connect_to_milvus()
-client = create_milvus_client()
+client = Lazy('vector store', create_vector_store)
@@ -0,0 +1,73 @@
+import json
+import os
+
+import numpy as np
+
+MODEL_FILE = 'model.onnx'
+QUANTIZED_MODEL_FILE = 'model-int8.onnx'
+TOKENIZER_FILE = 'tokenizer.json'
+CONFIG_FILE = 'embedding_config.json'
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def model_directory(path):
+    return path if os.path.isabs(path) else os.path.join(BASE_DIR, path)
+
+
+class OnnxEmbedder:
+    def __init__(self, session, tokenizer, max_seq_length, normalize=True):
+        tokenizer.no_padding()
+        tokenizer.enable_truncation(max_length=max_seq_length)
+        self.session = session
+        self.tokenizer = tokenizer
+        self.max_seq_length = max_seq_length
+        self.normalize = normalize
+        self.input_names = [model_input.name for model_input in session.get_inputs()]
+
+    @classmethod
+    def from_directory(cls, directory, quantized=False, intra_op_threads=0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        directory = model_directory(directory)
+        with open(os.path.join(directory, CONFIG_FILE), 'r', encoding='utf-8') as file:
+            config = json.load(file)
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        model_path = os.path.join(directory, QUANTIZED_MODEL_FILE if quantized else MODEL_FILE)
+        session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        tokenizer = Tokenizer.from_file(os.path.join(directory, TOKENIZER_FILE))
+        return cls(session, tokenizer, config['max_seq_length'], config.get('normalize', True))
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        single = isinstance(sentences, str)
+        sentences = [sentences] if single else list(sentences)
+        embeddings = np.zeros((len(sentences), 0), dtype=np.float32)
+        if sentences:
+            encodings = self.tokenizer.encode_batch(sentences)
+            order = np.argsort([-len(encoding.ids) for encoding in encodings], kind='stable')
+            batches = [self._embed([encodings[index] for index in order[start:start + batch_size]])
+                       for start in range(0, len(order), batch_size)]
+            embeddings = np.empty((len(sentences), batches[0].shape[1]), dtype=np.float32)
+            embeddings[order] = np.concatenate(batches)
+        return embeddings[0] if single else embeddings
+
+    def _embed(self, encodings):
+        length = max(len(encoding.ids) for encoding in encodings)
+        inputs = {name: np.zeros((len(encodings), length), dtype=np.int64) for name in
+                  ('input_ids', 'attention_mask', 'token_type_ids')}
+        for row, encoding in enumerate(encodings):
+            size = len(encoding.ids)
+            inputs['input_ids'][row, :size] = encoding.ids
+            inputs['attention_mask'][row, :size] = encoding.attention_mask
+            inputs['token_type_ids'][row, :size] = encoding.type_ids
+
+        hidden = self.session.run(None, {name: inputs[name] for name in self.input_names})[0]
+        mask = inputs['attention_mask'][:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.normalize:
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled.astype(np.float32)
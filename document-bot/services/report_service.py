@@ -0,0 +1,121 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ReportJobQueue:
+    def __init__(self, build, directory, workers, ttl, sweep_interval):
+        self.directory = directory
+        self.workers = workers
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._build = build
+        self._jobs = {}
+        self._queue = None
+        self._tasks = []
+
+    def job_id(self, search_term):
+        normalized = ' '.join(search_term.split())
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+    def path(self, job_id):
+        return os.path.join(self.directory, f'{job_id}.pdf')
+
+    def submit(self, search_term):
+        self.evict_expired()
+        job_id = self.job_id(search_term)
+        status = self.status(job_id)
+        if status in ('pending', 'running', 'done'):
+            return job_id, status
+
+        self._start_workers()
+        self._jobs[job_id] = {'status': 'pending', 'search_term': search_term, 'finished_at': None, 'error': None}
+        self._queue.put_nowait(job_id)
+        return job_id, 'pending'
+
+    def poll(self, job_id):
+        self.evict_expired()
+        return self.status(job_id)
+
+    def status(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is not None and job['status'] != 'done':
+            return job['status']
+        if self._is_fresh(self.path(job_id)):
+            return 'done'
+        return None
+
+    def error(self, job_id):
+        job = self._jobs.get(job_id)
+        return job['error'] if job else None
+
+    def evict_expired(self):
+        if not os.path.isdir(self.directory):
+            return
+        for file_name in os.listdir(self.directory):
+            path = os.path.join(self.directory, file_name)
+            if file_name.endswith('.pdf') and not self._is_fresh(path):
+                os.remove(path)
+
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job['status'] == 'done' and not os.path.exists(self.path(job_id)):
+                del self._jobs[job_id]
+            elif job['status'] == 'failed' and now - job['finished_at'] > self.ttl:
+                del self._jobs[job_id]
+
+    def start(self):
+        self._start_workers()
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _is_fresh(self, path):
+        try:
+            return time.time() - os.path.getmtime(path) <= self.ttl
+        except OSError:
+            return False
+
+    def _start_workers(self):
+        if self._tasks:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.ensure_future(self._sweep()))
+
+    async def _sweep(self):
+        # Evict on a timer too, otherwise finished reports outlive their TTL whenever no new job is submitted
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                self.evict_expired()
+            except Exception:
+                logger.exception('Could not evict expired reports')
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            job = self._jobs[job_id]
+            job['status'] = 'running'
+            part_path = self.path(job_id) + '.part'
+            try:
+                await self._build(job['search_term'], part_path)
+                os.replace(part_path, self.path(job_id))
+                job['status'] = 'done'
+            except Exception as e:
+                logger.exception(f'Report job {job_id} failed')
+                job['status'] = 'failed'
+                job['error'] = str(e)
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+            finally:
+                job['finished_at'] = time.time()
+                self._queue.task_done()
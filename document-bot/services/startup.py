@@ -0,0 +1,53 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+timings = {}
+_timings_lock = threading.Lock()
+
+
+class Lazy:
+    def __init__(self, name, factory):
+        self.name = name
+        self._factory = factory
+        self._value = None
+        self._created = False
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        if not self._created:
+            with self._lock:
+                if not self._created:
+                    with timed(self.name):
+                        self._value = self._factory()
+                    self._created = True
+        return self._value
+
+    def __getattr__(self, name):
+        return getattr(self(), name)
+
+    def call(self, method, *args, **kwargs):
+        # Resolves the value in the calling thread, pass this to an executor instead of a bound method so the
+        # factory never runs on the event loop
+        return getattr(self(), method)(*args, **kwargs)
+
+    def initialized(self):
+        return self._created
+
+
+@contextmanager
+def timed(name):
+    started = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - started
+    with _timings_lock:
+        timings[name] = elapsed
+    logger.info(f'Initialized {name} in {elapsed:.2f}s')
+
+def log_startup_breakdown(total):
+    with _timings_lock:
+        parts = ', '.join(f'{name} {elapsed:.2f}s' for name, elapsed in timings.items())
+    logger.info(f'Startup finished in {total:.2f}s ({parts})')
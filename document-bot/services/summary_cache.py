@@ -0,0 +1,76 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import configs.env as env
+
+
+class SummaryCache:
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS summaries ('
+                'project_id INTEGER, document_id INTEGER, version INTEGER, prompt TEXT, '
+                'summary TEXT, created_at TEXT, '
+                'PRIMARY KEY (project_id, document_id, version, prompt))'
+            )
+            self._connection.commit()
+        return self._connection
+
+    def get(self, project_id, document_id, version, prompt):
+        key = (int(project_id), int(document_id), int(version), prompt)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            row = self._connect().execute(
+                'SELECT summary FROM summaries WHERE project_id = ? AND document_id = ? AND version = ? AND prompt = ?',
+                key
+            ).fetchone()
+            if row is None:
+                return None
+            self._remember(key, row[0])
+            return row[0]
+
+    def put(self, project_id, document_id, version, prompt, summary):
+        key = (int(project_id), int(document_id), int(version), prompt)
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                'INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?, ?)',
+                key + (summary, datetime.now().isoformat())
+            )
+            connection.commit()
+            self._remember(key, summary)
+
+    def invalidate(self, project_id, document_id, version):
+        version_key = (int(project_id), int(document_id), int(version))
+        with self._lock:
+            for key in [key for key in self._entries if key[:3] == version_key]:
+                del self._entries[key]
+            connection = self._connect()
+            connection.execute(
+                'DELETE FROM summaries WHERE project_id = ? AND document_id = ? AND version = ?',
+                version_key
+            )
+            connection.commit()
+
+    def _remember(self, key, summary):
+        self._entries[key] = summary
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+summary_cache = SummaryCache(env.SUMMARY_CACHE_PATH, env.SUMMARY_CACHE_SIZE)
@@ -0,0 +1,61 @@
+class Hit(dict):
+    @property
+    def id(self):
+        return self['id']
+
+    @property
+    def distance(self):
+        return self['distance']
+
+    @property
+    def entity(self):
+        return self['entity']
+
+
+class VectorStore:
+    def start(self):
+        pass
+
+    def ready(self):
+        raise NotImplementedError
+
+    def status(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def insert(self, collection_name, data):
+        raise NotImplementedError
+
+    def insert_columns(self, collection_name, columns):
+        raise NotImplementedError
+
+    def upsert(self, collection_name, data):
+        raise NotImplementedError
+
+    def get(self, collection_name, ids, output_fields=None):
+        raise NotImplementedError
+
+    def delete(self, collection_name, pks):
+        raise NotImplementedError
+
+    def query(self, collection_name, filter='', output_fields=None, limit=None):
+        raise NotImplementedError
+
+    def search(self, collection_name, data, anns_field, filter='', limit=10, output_fields=None, search_params=None):
+        raise NotImplementedError
+
+    def hybrid_search(self, collection_name, reqs, ranker, limit=10, output_fields=None):
+        raise NotImplementedError
+
+    def get_collection_stats(self, collection_name):
+        raise NotImplementedError
+
+
+def as_list(value):
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+def as_columns(data):
+    rows = data if isinstance(data, (list, tuple)) else [data]
+    return {field_name: [row[field_name] for row in rows] for field_name in rows[0]} if rows else {}
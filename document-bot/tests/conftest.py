@@ -0,0 +1,57 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import configs.env as env
+from services.local_vector_store import LocalVectorStore
+
+
+def vector(*values):
+    return list(values) + [0.0] * (env.DIMENSION - len(values))
+
+def insert_chunks(store, rows):
+    columns = {field_name: [row[field_name] for row in rows] for field_name in
+               ('project_id', 'document_id', 'name', 'version', 'chunk_id', 'text', 'txt_emb')}
+    return store.insert_columns('documents', columns)
+
+def chunk_row(project_id, document_id, version, chunk_id, text, embedding=None):
+    return {'project_id': project_id, 'document_id': document_id, 'name': 'doc', 'version': version,
+            'chunk_id': chunk_id, 'text': text, 'txt_emb': embedding or vector(float(chunk_id))}
+
+def saga_event(transaction_id, document_id, text, version=1):
+    from datetime import datetime
+    from services.event_service import EEventSource, ESagaStatus, Event
+    return Event(transactionId=transaction_id, source=EEventSource.ORCHESTRATOR, createdAt=datetime.now(),
+                 status=ESagaStatus.SUCCESS,
+                 payload={'projectId': 1, 'documentId': document_id, 'name': 'doc', 'version': version, 'text': text})
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LocalVectorStore(str(tmp_path / 'vector_store'), flush_interval=3600)
+    yield store
+    store.close()
+
+
+class SplitChunker:
+    def split_text(self, text):
+        return [part.strip() for part in text.split('|') if part.strip()]
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    from services import embedding_service
+    encoded = []
+
+    def encode(data, lane='ingest'):
+        encoded.extend(data)
+        return [vector(float(len(text)), float(sum(map(ord, text)) % 97)) for text in data]
+
+    monkeypatch.setattr(embedding_service, 'splitter', SplitChunker)
+    monkeypatch.setattr(embedding_service, 'encode', encode)
+    for cache_name in ('embedding_cache', 'ingest_cache'):
+        monkeypatch.setattr(embedding_service, cache_name, embedding_service.EmbeddingCache(env.EMBEDDING_MODEL_NAME, 100))
+    return encoded
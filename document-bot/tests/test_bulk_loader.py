@@ -0,0 +1,71 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+from pymilvus import BulkInsertState
+from schemas import bulk_loader
+from schemas.bulk_loader import BulkImportSink, Checkpoint
+from schemas.collection_specs import SPECS
+
+
+class FakeMilvus:
+    def __init__(self, states):
+        self.states = states
+        self.imported = []
+
+    def do_bulk_insert(self, collection_name, files):
+        self.imported.extend(files)
+        return 100 + len(self.imported)
+
+    def get_bulk_insert_state(self, task_id):
+        return SimpleNamespace(state=self.states.get(task_id, BulkInsertState.ImportCompleted), state_name='state',
+                               progress=100, row_count=1, failed_reason='broken file')
+
+
+@pytest.fixture
+def bulk_import(tmp_path, monkeypatch):
+    uploaded = []
+    monkeypatch.setattr(bulk_loader.env, 'BULK_IMPORT_POLL_INTERVAL', 0)
+    monkeypatch.setattr(bulk_loader, 'Minio', lambda *args, **kwargs: SimpleNamespace(
+        fput_object=lambda bucket, remote_file, path: uploaded.append(os.path.basename(path))))
+    sink = BulkImportSink(SPECS['projects'], directory=str(tmp_path / 'bulk'), storage='minio')
+    for index in range(3):
+        open(os.path.join(sink.directory, f'{index:05d}.parquet'), 'wb').close()
+    return sink, Checkpoint(str(tmp_path / 'projects.json')), uploaded
+
+def test_checkpoint_keeps_import_records_across_position_updates(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / 'projects.json'))
+    checkpoint.save_import('00000.parquet', 7, 'completed')
+    checkpoint.save(12, 3, 40)
+
+    assert checkpoint.load() == {'row': 12, 'chunk': 3, 'inserted': 40,
+                                 'imports': {'00000.parquet': {'task_id': 7, 'state': 'completed'}}}
+
+def test_resumed_import_skips_completed_files_and_waits_on_started_tasks(bulk_import, monkeypatch):
+    sink, checkpoint, uploaded = bulk_import
+    checkpoint.save(10, 1, 30)
+    checkpoint.save_import('00000.parquet', 7, 'completed')
+    checkpoint.save_import('00001.parquet', 8, 'started')
+    milvus = FakeMilvus({})
+    monkeypatch.setattr(bulk_loader, 'utility', milvus)
+
+    sink.close(checkpoint)
+
+    assert uploaded == ['00002.parquet']
+    assert milvus.imported == ['bulk_import/projects/00002.parquet']
+    assert checkpoint.load()['imports'] == {'00000.parquet': {'task_id': 7, 'state': 'completed'},
+                                            '00001.parquet': {'task_id': 8, 'state': 'completed'},
+                                            '00002.parquet': {'task_id': 101, 'state': 'completed'}}
+
+def test_failed_import_is_submitted_again_on_resume(bulk_import, monkeypatch):
+    sink, checkpoint, uploaded = bulk_import
+    milvus = FakeMilvus({102: BulkInsertState.ImportFailed})
+    monkeypatch.setattr(bulk_loader, 'utility', milvus)
+
+    with pytest.raises(Exception, match='broken file'):
+        sink.close(checkpoint)
+    assert checkpoint.load()['imports']['00001.parquet'] == {'task_id': 102, 'state': 'failed'}
+
+    sink.close(checkpoint)
+    assert milvus.imported[3:] == ['bulk_import/projects/00001.parquet']
+    assert {record['state'] for record in checkpoint.load()['imports'].values()} == {'completed'}
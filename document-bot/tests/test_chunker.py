@@ -0,0 +1,36 @@
+from services.chunker import TokenChunker
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+
+def word_tokenizer():
+    vocab = {'[UNK]': 0}
+    tokenizer = Tokenizer(WordLevel(vocab, unk_token='[UNK]'))
+    tokenizer.pre_tokenizer = Whitespace()
+    return tokenizer
+
+
+def test_windows_overlap_by_the_configured_tokens():
+    chunker = TokenChunker(word_tokenizer(), tokens_per_chunk=4, chunk_overlap=1)
+
+    assert chunker.split_text('a b c d e f g') == ['a b c d', 'd e f g']
+    assert chunker.split_text('   ') == []
+
+def test_chunks_collapse_whitespace():
+    chunker = TokenChunker(word_tokenizer(), tokens_per_chunk=3, chunk_overlap=0)
+
+    assert chunker.split_text('one\n\n  two\t three   four') == ['one two three', 'four']
+
+def test_long_windows_are_split_to_fit_the_column():
+    chunker = TokenChunker(word_tokenizer(), tokens_per_chunk=8, chunk_overlap=0, max_bytes=20)
+    text = ' '.join(f'word{index:02d}' for index in range(8))
+
+    chunks = chunker.split_text(text)
+    assert all(len(chunk.encode('utf-8')) <= 20 for chunk in chunks)
+    assert ' '.join(chunks) == text
+
+def test_single_tokens_longer_than_the_column_are_clamped():
+    chunker = TokenChunker(word_tokenizer(), tokens_per_chunk=8, chunk_overlap=0, max_bytes=10)
+
+    assert chunker.split_text('short ' + 'é' * 30) == ['short', 'é' * 5]
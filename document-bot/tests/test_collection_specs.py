@@ -0,0 +1,23 @@
+import configs.env as env
+import pytest
+from schemas.collection_specs import DOCUMENTS
+
+
+@pytest.mark.parametrize('index_type, expected', [
+    ('IVF_FLAT', {'nprobe': 3}),
+    ('IVF_SQ8', {'nprobe': 3}),
+    ('HNSW', {'ef': 40}),
+    ('FLAT', {}),
+])
+def test_search_params_follow_the_field_index_type(monkeypatch, index_type, expected):
+    monkeypatch.setitem(env.INDEX_PARAMS, DOCUMENTS.name, {'txt_emb': {'index_type': index_type, 'params': {}}})
+    monkeypatch.setitem(env.SEARCH_PARAMS, DOCUMENTS.name, {'txt_emb': {'nprobe': 3, 'ef': 40}})
+
+    assert DOCUMENTS.search_params('txt_emb') == {'metric_type': env.METRIC_TYPE, 'params': expected}
+
+def test_search_params_fall_back_to_index_type_defaults(monkeypatch):
+    monkeypatch.setitem(env.INDEX_PARAMS, DOCUMENTS.name, {'txt_emb': {'index_type': 'HNSW', 'params': {'M': 16}}})
+    monkeypatch.setitem(env.SEARCH_PARAMS, DOCUMENTS.name, {})
+
+    assert DOCUMENTS.search_params('txt_emb')['params'] == {'ef': 64}
+    assert DOCUMENTS.index_params('txt_emb') == {'metric_type': env.METRIC_TYPE, 'index_type': 'HNSW', 'params': {'M': 16}}
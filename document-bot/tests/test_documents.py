@@ -0,0 +1,141 @@
+import pytest
+from routers import documents
+from services import milvus_service
+from services.summary_cache import SummaryCache
+
+from tests.conftest import chunk_row, insert_chunks, saga_event
+
+
+@pytest.fixture
+def document_store(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(documents, 'client', store)
+    monkeypatch.setattr(milvus_service, 'client', store)
+    monkeypatch.setattr(documents, 'summary_cache', SummaryCache(str(tmp_path / 'summaries.db'), 16))
+    return store
+
+
+def test_find_chunks_by_version_returns_chunks_in_order(document_store):
+    insert_chunks(document_store, [chunk_row(1, 2, 3, 2, 'second'), chunk_row(1, 2, 3, 1, 'first'),
+                                   chunk_row(1, 2, 4, 1, 'other version')])
+
+    chunks = documents.find_chunks_by_version(1, 2, 3)
+    assert [chunk['text'] for chunk in chunks] == ['first', 'second']
+
+def version_texts(store, version):
+    rows = store.query('documents', filter=f'project_id == 1 and document_id == 2 and version == {version}',
+                       output_fields=['chunk_id', 'text'])
+    return [row['text'] for row in sorted(rows, key=lambda row: row['chunk_id'])]
+
+def test_insert_document_replaces_only_the_same_version(document_store, fake_embeddings):
+    documents.insert_document(1, 2, 'doc', 1, 'one | two')
+    documents.insert_document(1, 2, 'doc', 2, 'three')
+    documents.insert_document('1', '2', 'doc', '1', 'one | changed')
+
+    assert version_texts(document_store, 1) == ['one', 'changed']
+    assert version_texts(document_store, 2) == ['three']
+
+def test_insert_document_reuses_embeddings_of_unchanged_chunks(document_store, fake_embeddings):
+    documents.insert_document(1, 2, 'doc', 1, 'one | two')
+    fake_embeddings.clear()
+    documents.insert_document(1, 2, 'doc', 2, 'one | three')
+
+    assert fake_embeddings == ['three']
+
+def test_insert_document_only_reuses_embeddings_of_the_base_version(document_store, fake_embeddings, monkeypatch):
+    insert_chunks(document_store, [chunk_row(1, 2, 1, 1, 'one'), chunk_row(1, 2, 2, 1, 'two'),
+                                   chunk_row(1, 2, 2, 2, 'two'), chunk_row(1, 2, 2, 3, 'three')])
+    fetched = []
+    get = document_store.get
+    monkeypatch.setattr(document_store, 'get', lambda collection_name, ids, output_fields=None:
+                        fetched.append(ids) or get(collection_name, ids, output_fields))
+
+    documents.insert_document(1, 2, 'doc', 3, 'one | two | two | four')
+
+    # Version 1 is older than the latest version 2, so 'one' is encoded again
+    assert fake_embeddings == ['one', 'four']
+    assert [len(ids) for ids in fetched] == [1]
+
+def test_insert_document_prefers_the_version_it_replaces(document_store, fake_embeddings):
+    insert_chunks(document_store, [chunk_row(1, 2, 1, 1, 'one'), chunk_row(1, 2, 2, 1, 'two')])
+
+    documents.insert_document(1, 2, 'doc', 1, 'one | two')
+
+    assert fake_embeddings == ['two']
+    assert version_texts(document_store, 1) == ['one', 'two']
+
+@pytest.mark.parametrize('text', ['', '   ', ' | '])
+def test_insert_document_keeps_previous_version_when_text_is_empty(document_store, fake_embeddings, text):
+    documents.insert_document(1, 2, 'doc', 1, 'one | two')
+
+    with pytest.raises(documents.EmptyDocument):
+        documents.insert_document(1, 2, 'doc', 1, text)
+    assert version_texts(document_store, 1) == ['one', 'two']
+
+def test_insert_document_rejects_filter_injection(document_store, fake_embeddings):
+    documents.insert_document(1, 2, 'doc', 1, 'one')
+    documents.insert_document(1, 3, 'doc', 1, 'other document')
+
+    with pytest.raises(ValueError):
+        documents.insert_document(1, 2, 'doc', '1 or project_id >= 0', 'replacement')
+    with pytest.raises(ValueError):
+        documents.version_filter(1, 2, '1 or true')
+    assert version_texts(document_store, 1) == ['one']
+    assert len(document_store.query('documents', filter='document_id == 3')) == 1
+
+def test_saga_batch_keeps_previous_version_when_text_is_empty(document_store, fake_embeddings, monkeypatch, tmp_path):
+    from datetime import datetime
+    from services.event_service import EEventSource, ESagaStatus, Event
+    from services.ingest_ledger import IngestLedger
+
+    produced = []
+    monkeypatch.setattr(documents, 'produce', lambda topic, value: produced.append(value))
+    monkeypatch.setattr(documents, 'ingest_ledger', IngestLedger(str(tmp_path / 'ingest.db')))
+    documents.insert_document(1, 2, 'doc', 1, 'one | two')
+
+    def event(transaction_id, document_id, text):
+        return Event(transactionId=transaction_id, source=EEventSource.ORCHESTRATOR, createdAt=datetime.now(),
+                     status=ESagaStatus.SUCCESS,
+                     payload={'projectId': 1, 'documentId': document_id, 'name': 'doc', 'version': 1, 'text': text})
+
+    empty, other = event('t1', 2, '   '), event('t2', 5, 'five')
+    documents.saga_create_batch([empty, other])
+
+    assert version_texts(document_store, 1) == ['one', 'two']
+    assert empty.status == ESagaStatus.ROLLBACK_PENDING
+    assert other.status == ESagaStatus.SUCCESS
+    assert len(document_store.query('documents', filter='document_id == 5')) == 1
+
+@pytest.fixture
+def saga(document_store, fake_embeddings, monkeypatch, tmp_path):
+    from services.ingest_ledger import IngestLedger
+    produced = []
+    monkeypatch.setattr(documents, 'produce', lambda topic, value: produced.append(value))
+    monkeypatch.setattr(documents, 'ingest_ledger', IngestLedger(str(tmp_path / 'ingest.db')))
+    return produced
+
+def test_redelivered_saga_event_is_ingested_again_after_delete(document_store, saga):
+    documents.saga_create(saga_event('t1', 2, 'one | two'))
+    for row in document_store.query('documents', filter='document_id == 2', output_fields=['id']):
+        documents.delete_vector(row['id'])
+
+    redelivered = saga_event('t1', 2, 'one | two')
+    documents.saga_create(redelivered)
+
+    assert version_texts(document_store, 1) == ['one', 'two']
+    assert redelivered.status.value == 'SUCCESS'
+
+def test_redelivered_saga_event_is_skipped_while_the_version_is_stored(document_store, saga, fake_embeddings):
+    documents.saga_create(saga_event('t1', 2, 'one | two'))
+    fake_embeddings.clear()
+    documents.saga_create_batch([saga_event('t1', 2, 'one | two')])
+
+    assert fake_embeddings == []
+    assert version_texts(document_store, 1) == ['one', 'two']
+
+def test_ledger_hit_without_stored_rows_ingests_again(document_store, saga):
+    documents.saga_create(saga_event('t1', 2, 'one'))
+    document_store.delete('documents', pks=[row['id'] for row in document_store.query('documents', output_fields=['id'])])
+
+    documents.saga_create_batch([saga_event('t1', 2, 'one')])
+
+    assert version_texts(document_store, 1) == ['one']
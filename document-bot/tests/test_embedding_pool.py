@@ -0,0 +1,58 @@
+import os
+import time
+
+import numpy as np
+import pytest
+from services.embedding_pool import EmbeddingWorkerPool, EncodeTimeout
+
+
+class FakeModel:
+    def encode(self, texts, batch_size=None):
+        for text in texts:
+            if text == 'hang':
+                time.sleep(60)
+            if text == 'crash':
+                os._exit(1)
+        return np.array([[len(text), 0, 0, 0] for text in texts], dtype=np.float32)
+
+def load_fake_model(threads):
+    if os.environ.get('FAKE_MODEL_BROKEN'):
+        raise RuntimeError('model files are gone')
+    return FakeModel()
+
+@pytest.fixture
+def pool():
+    pool = EmbeddingWorkerPool(load_fake_model, workers=1, max_ingest_workers=1, max_rows=4, input_bytes=1024,
+                               dimension=4, threads=1, start_timeout=30, check_interval=0.05)
+    yield pool
+    pool.close()
+
+def wait_until(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+def test_pool_restarts_a_worker_that_overruns_the_timeout(pool):
+    started = time.monotonic()
+    with pytest.raises(EncodeTimeout):
+        pool.encode(['hang'], timeout=0.5)
+
+    assert time.monotonic() - started < 10
+    assert pool.encode(['four']).tolist() == [[4, 0, 0, 0]]
+
+def test_pool_restarts_a_worker_that_crashed_right_after_reporting(pool):
+    with pytest.raises(RuntimeError, match='exited while encoding'):
+        pool.encode(['crash'])
+
+    assert pool.encode(['four']).tolist() == [[4, 0, 0, 0]]
+
+def test_pool_rejects_batches_when_a_worker_cannot_restart(pool, monkeypatch):
+    monkeypatch.setenv('FAKE_MODEL_BROKEN', '1')
+    with pytest.raises(RuntimeError, match='exited while encoding'):
+        pool.encode(['crash'])
+
+    wait_until(lambda: pool.stats()['failed'])
+    assert 'model files are gone' in pool.stats()['failed'][0]
+    with pytest.raises(RuntimeError, match='No embedding workers are running'):
+        pool.encode(['four'])
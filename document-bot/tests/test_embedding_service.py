@@ -0,0 +1,79 @@
+import threading
+
+import numpy as np
+import pytest
+from services import embedding_service
+from services.embedding_service import EmbeddingCache, MicroBatcher
+
+
+def test_cache_normalizes_whitespace_and_stores_float32():
+    cache = EmbeddingCache('model', 10)
+    cache.put('hello   world', [0.5, 0.25])
+
+    embedding = cache.get(' hello world ')
+    assert embedding.dtype == np.float32
+    assert embedding.tolist() == [0.5, 0.25]
+    assert cache.get('hello') is None
+    assert cache.stats() == {'size': 1, 'max_size': 10, 'hits': 1, 'misses': 1}
+
+def test_cache_evicts_least_recently_used():
+    cache = EmbeddingCache('model', 2)
+    cache.put('a', [1.0])
+    cache.put('b', [2.0])
+    cache.get('a')
+    cache.put('c', [3.0])
+
+    assert cache.get('b') is None
+    assert cache.get('a').tolist() == [1.0]
+    assert cache.get('c').tolist() == [3.0]
+
+def test_cache_keys_depend_on_the_model():
+    assert EmbeddingCache('a', 1).key('text') != EmbeddingCache('b', 1).key('text')
+
+def test_embed_batch_encodes_only_missing_texts(fake_embeddings):
+    first = embedding_service.embed_batch(['a', 'bb'])
+    second = embedding_service.embed_batch(['bb', 'ccc'])
+
+    assert fake_embeddings == ['a', 'bb', 'ccc']
+    assert second[0] == first[1]
+    assert all(isinstance(embedding, list) for embedding in first + second)
+
+def test_chunk_embeddings_do_not_evict_query_embeddings(fake_embeddings, monkeypatch):
+    monkeypatch.setattr(embedding_service, 'embedding_cache', EmbeddingCache('model', 2))
+    embedding_service.embed_batch(['title'])
+    chunks = [(chunk_id, f'chunk {chunk_id}', str(chunk_id)) for chunk_id in range(10)]
+    embedding_service.embed_chunks(chunks)
+
+    assert embedding_service.embedding_cache.stats()['size'] == 1
+    assert embedding_service.embedding_cache.get('title') is not None
+    assert embedding_service.ingest_cache.get('chunk 3') is not None
+
+def test_micro_batcher_groups_concurrent_queries():
+    batches = []
+    release = threading.Event()
+
+    def encode(texts):
+        release.wait(1)
+        batches.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    batcher = MicroBatcher(encode, max_batch_size=4, max_wait_ms=50)
+    futures = [batcher.submit(text) for text in ['a', 'bb', 'ccc', 'dddd', 'eeeee']]
+    release.set()
+
+    assert [future.result(timeout=5) for future in futures] == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+    assert [len(batch) for batch in batches] == [4, 1]
+    stats = batcher.stats()
+    assert stats['batches'] == 2 and stats['items'] == 5 and stats['largest_batch'] == 4
+
+def test_micro_batcher_fails_every_query_of_a_failed_batch():
+    def encode(texts):
+        raise RuntimeError('model unavailable')
+
+    batcher = MicroBatcher(encode, max_batch_size=8, max_wait_ms=20)
+    futures = [batcher.submit(text) for text in ['a', 'b']]
+
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+    assert batcher.submit('c').exception(timeout=5) is not None
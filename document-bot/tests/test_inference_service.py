@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from services.inference_service import InferenceClient
+
+
+@pytest.fixture(autouse=True)
+def access_token(monkeypatch):
+    monkeypatch.setenv('DOCUBOT_ACCESS_TOKEN', 'token')
+
+def inference_client(handler, max_concurrency=4):
+    return InferenceClient('https://inference.test/models', timeout=5, max_connections=4,
+                           max_concurrency=max_concurrency, max_retries=3, backoff_base=0.001, backoff_max=0.2,
+                           transport=httpx.MockTransport(handler))
+
+def test_post_retries_429_and_503_and_honours_retry_after():
+    statuses = [503, 429, 200]
+    requests = []
+
+    def handler(request):
+        requests.append((time.monotonic(), request.headers['Authorization']))
+        status = statuses[len(requests) - 1]
+        return httpx.Response(status, headers={'Retry-After': '1'} if status == 429 else {}, json={})
+
+    async def post():
+        client = inference_client(handler)
+        try:
+            return await client.post('model', {'inputs': 'text'})
+        finally:
+            await client.close()
+
+    assert asyncio.run(post()).status_code == 200
+    assert [authorization for _, authorization in requests] == ['Bearer token'] * 3
+    # Retry-After asks for 1s, capped at backoff_max, the 503 retry only waits for the tiny backoff
+    assert requests[1][0] - requests[0][0] < 0.1
+    assert requests[2][0] - requests[1][0] >= 0.19
+
+def test_post_gives_up_after_max_retries():
+    async def post():
+        client = inference_client(lambda request: httpx.Response(503))
+        try:
+            return await client.post('model', {})
+        finally:
+            await client.close()
+
+    assert asyncio.run(post()).status_code == 503
+
+def test_post_bounds_concurrency_over_one_reused_client():
+    active, peak, clients = 0, 0, set()
+
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return httpx.Response(200, json={})
+
+    async def post_many():
+        client = inference_client(handler, max_concurrency=2)
+        try:
+            for _ in range(3):
+                await asyncio.gather(*(client.post('model', {}) for _ in range(4)))
+                clients.add(id(client._client))
+        finally:
+            await client.close()
+
+    asyncio.run(post_many())
+    assert peak == 2
+    assert len(clients) == 1
+
+def test_backoff_releases_the_concurrency_slot():
+    order = []
+
+    async def handler(request):
+        order.append(request.url.path)
+        if request.url.path == '/models/busy' and order.count('/models/busy') == 1:
+            return httpx.Response(429, headers={'Retry-After': '1'})
+        return httpx.Response(200, json={})
+
+    async def post_both():
+        client = inference_client(handler, max_concurrency=1)
+        try:
+            busy = asyncio.ensure_future(client.post('busy', {}))
+            await asyncio.sleep(0.05)
+            await client.post('free', {})
+            await busy
+        finally:
+            await client.close()
+
+    asyncio.run(post_both())
+    assert order == ['/models/busy', '/models/free', '/models/busy']
@@ -0,0 +1,90 @@
+import threading
+
+from confluent_kafka import TopicPartition
+from services.event_service import to_json
+from services.kafka_consumer import SagaConsumer
+from tests.conftest import saga_event
+
+
+class FakeMessage:
+    def __init__(self, partition, offset, event):
+        self._partition = partition
+        self._offset = offset
+        self._value = to_json(event).encode('utf-8')
+
+    def topic(self):
+        return 'document-bot-success'
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+    def value(self):
+        return self._value
+
+    def error(self):
+        return None
+
+
+class FakeConsumer:
+    def __init__(self):
+        self.commits = []
+        self.paused = []
+
+    def commit(self, offsets, asynchronous):
+        self.commits.append(([(o.partition, o.offset) for o in offsets], asynchronous))
+
+    def get_watermark_offsets(self, partition, cached):
+        return 0, 10
+
+    def pause(self, partitions):
+        self.paused.extend(partitions)
+
+
+def test_revoke_commits_completed_offsets_and_skips_queued_messages():
+    consumer = FakeConsumer()
+    started, release = threading.Event(), threading.Event()
+    handled = []
+
+    def handler(event):
+        handled.append(event.transactionId)
+        if event.transactionId == 't0':
+            started.set()
+            release.wait(5)
+
+    saga_consumer = SagaConsumer(consumer, handler, workers=1)
+    try:
+        saga_consumer._dispatch([FakeMessage(1, 7, saga_event('t-done', 1, 'one'))])
+        saga_consumer._lanes[0].submit(lambda: None).result(5)
+        saga_consumer._dispatch([FakeMessage(0, offset, saga_event(f't{offset}', 2, 'one')) for offset in range(3)])
+        assert started.wait(5)
+
+        saga_consumer._on_revoke(consumer, [TopicPartition('document-bot-success', 0),
+                                            TopicPartition('document-bot-success', 1)])
+        release.set()
+        saga_consumer._lanes[0].submit(lambda: None).result(5)
+        saga_consumer._commit_completed()
+    finally:
+        release.set()
+        saga_consumer._lanes[0].shutdown()
+
+    assert consumer.commits == [([(1, 8)], False)]
+    assert handled == ['t-done', 't0']
+    assert saga_consumer.metrics['revoked'] == 2
+    assert saga_consumer.metrics['in_flight'] == 0
+    assert saga_consumer._offsets == {}
+    assert saga_consumer.metrics['lag'] == {}
+
+def test_partitions_assigned_while_paused_stay_paused():
+    consumer = FakeConsumer()
+    saga_consumer = SagaConsumer(consumer, handler=None, workers=1)
+    saga_consumer._paused = True
+    partitions = [TopicPartition('document-bot-success', 0)]
+    try:
+        saga_consumer._on_assign(consumer, partitions)
+    finally:
+        saga_consumer._lanes[0].shutdown()
+
+    assert consumer.paused == partitions
@@ -0,0 +1,100 @@
+import time
+
+import numpy as np
+import pytest
+from services.local_vector_store import LocalVectorStore, evaluate_filter, parse_filter
+
+from tests.conftest import chunk_row, insert_chunks, vector
+
+
+def test_filter_combines_comparisons_and_membership():
+    columns = {'project_id': np.array([1, 1, 2, 3]), 'name': np.array(['a', 'b', 'a', 'c'], dtype=object)}
+    matched = evaluate_filter(parse_filter('project_id == 1 and name == "b" || project_id in [3]'), columns)
+    assert matched.tolist() == [False, True, False, True]
+
+def test_filter_supports_not_and_chained_comparisons():
+    columns = {'version': np.array([1, 2, 3, 4])}
+    assert evaluate_filter(parse_filter('1 < version <= 3'), columns).tolist() == [False, True, True, False]
+    assert evaluate_filter(parse_filter('not version == 2'), columns).tolist() == [True, False, True, True]
+
+def test_filter_rejects_unknown_fields_and_calls():
+    with pytest.raises(ValueError):
+        evaluate_filter(parse_filter('owner == 1'), {'project_id': np.array([1])})
+    with pytest.raises(ValueError):
+        evaluate_filter(parse_filter('__import__("os")'), {'project_id': np.array([1])})
+
+def test_query_filters_limits_and_projects_fields(store):
+    insert_chunks(store, [chunk_row(1, 1, 1, 1, 'a'), chunk_row(1, 1, 2, 1, 'b'), chunk_row(2, 1, 1, 1, 'c')])
+
+    rows = store.query('documents', filter='project_id == 1', output_fields=['text'])
+    assert sorted(row['text'] for row in rows) == ['a', 'b']
+    assert set(rows[0]) == {'id', 'text'}
+    assert len(store.query('documents', filter='project_id == 1', limit=1)) == 1
+    assert store.query('documents', filter='project_id == 3') == []
+
+def test_delete_hides_rows_from_query_and_search(store):
+    ids = insert_chunks(store, [chunk_row(1, 1, 1, 1, 'a'), chunk_row(1, 1, 1, 2, 'b')])['ids']
+    store.delete('documents', pks=[ids[0]])
+
+    assert [row['text'] for row in store.query('documents', filter='project_id == 1', output_fields=['text'])] == ['b']
+    hits = store.search('documents', data=[vector(1.0)], anns_field='txt_emb', limit=5, output_fields=['text'])[0]
+    assert [hit.entity['text'] for hit in hits] == ['b']
+
+def test_search_orders_by_distance_within_filter(store):
+    insert_chunks(store, [chunk_row(1, 1, 1, 1, 'near', vector(1.0)), chunk_row(1, 1, 1, 2, 'far', vector(5.0)),
+                          chunk_row(2, 1, 1, 3, 'other', vector(1.0))])
+
+    hits = store.search('documents', data=[vector(1.0)], anns_field='txt_emb', filter='project_id == 1',
+                        limit=5, output_fields=['text'])[0]
+    assert [hit.entity['text'] for hit in hits] == ['near', 'far']
+    assert hits[0].distance == pytest.approx(0.0)
+
+def test_rows_survive_reopening(tmp_path):
+    store = LocalVectorStore(str(tmp_path), flush_interval=3600)
+    ids = insert_chunks(store, [chunk_row(1, 1, 1, 1, 'a'), chunk_row(1, 1, 1, 2, 'b')])['ids']
+    store.delete('documents', pks=[ids[1]])
+    store.close()
+
+    reopened = LocalVectorStore(str(tmp_path), flush_interval=3600)
+    assert reopened.get('documents', ids=ids, output_fields=['text']) == [{'id': ids[0], 'text': 'a'}]
+    reopened.close()
+
+def test_flush_keeps_built_indexes(store, monkeypatch):
+    import configs.env as env
+    monkeypatch.setattr(env, 'LOCAL_STORE_ANN_MIN_ROWS', 1)
+    insert_chunks(store, [chunk_row(1, 1, 1, chunk_id, str(chunk_id)) for chunk_id in range(1, 21)])
+    store.search('documents', data=[vector(3.0)], anns_field='txt_emb', limit=1)
+    collection = store.collection('documents')
+    index = collection._indexes['txt_emb'][0]
+
+    store.flush()
+    ids = insert_chunks(store, [chunk_row(1, 1, 1, 30, 'new', vector(30.0))])['ids']
+    hits = store.search('documents', data=[vector(30.0)], anns_field='txt_emb', limit=1)[0]
+
+    assert collection._indexes['txt_emb'][0] is index
+    assert [hit.id for hit in hits] == ids
+
+def test_background_flush_writes_changes(tmp_path):
+    store = LocalVectorStore(str(tmp_path), flush_interval=0.05)
+    store.start()
+    insert_chunks(store, [chunk_row(1, 1, 1, 1, 'a')])
+    collection = store.collection('documents')
+    for _ in range(100):
+        if not collection.dirty:
+            break
+        time.sleep(0.05)
+    assert not collection.dirty
+    store.close()
+    assert LocalVectorStore(str(tmp_path), flush_interval=3600).query('documents', output_fields=['text']) == \
+        [{'id': 1, 'text': 'a'}]
+
+def test_flush_compacts_mostly_deleted_collections(store):
+    ids = insert_chunks(store, [chunk_row(1, 1, 1, chunk_id, str(chunk_id)) for chunk_id in range(1, 11)])['ids']
+    store.delete('documents', pks=ids[:8])
+    store.flush()
+
+    collection = store.collection('documents')
+    assert collection._size == 2
+    assert sorted(row['text'] for row in store.query('documents', output_fields=['text'])) == ['10', '9']
+    hits = store.search('documents', data=[vector(9.0)], anns_field='txt_emb', limit=1, output_fields=['text'])[0]
+    assert hits[0].entity['text'] == '9'
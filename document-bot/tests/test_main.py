@@ -0,0 +1,87 @@
+import threading
+
+import configs.env as env
+import main
+import pytest
+from fastapi.testclient import TestClient
+from services.executor_service import BoundedExecutor, ExecutorSaturated
+
+
+def test_saturated_pool_is_returned_as_503_with_retry_after(monkeypatch):
+    async def saturated(fn, *args, **kwargs):
+        raise ExecutorSaturated('The io pool is saturated, try again later')
+
+    monkeypatch.setattr(main.documents.io_executor, 'run', saturated)
+    response = TestClient(main.app).post('/api/v1/collections/documents/summarize',
+                                         json={'project_id': 1, 'document_id': 2, 'version': 3})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(env.SATURATED_RETRY_AFTER)
+    assert 'saturated' in response.json()['error']
+
+def test_bounded_executor_rejects_work_past_its_queue_depth():
+    release = threading.Event()
+    executor = BoundedExecutor('test', max_workers=1, queue_depth=1)
+    try:
+        executor.submit(release.wait, blocking=False)
+        executor.submit(release.wait, blocking=False)
+        with pytest.raises(ExecutorSaturated):
+            executor.submit(release.wait, blocking=False)
+    finally:
+        release.set()
+        executor.shutdown()
+
+def test_metrics_expose_embedding_and_producer_counters():
+    content = TestClient(main.app).get('/api/v1/health/metrics').json()
+
+    assert set(content['embeddings']) == {'query_batcher', 'embedding_cache', 'ingest_cache', 'embedding_pool'}
+    assert content['embeddings']['query_batcher']['batches'] >= 0
+    assert set(content['kafka_producer']) == {'produced', 'delivered', 'failed'}
+    assert content['kafka_consumer'] == {}
+
+def test_metrics_expose_the_running_saga_consumer(monkeypatch):
+    from services import kafka_consumer
+    saga_consumer = kafka_consumer.SagaConsumer(consumer=None, handler=None, workers=1)
+    saga_consumer.metrics.update(received=3, processed=2, failed=1)
+    saga_consumer.metrics['lag']['document-bot-success[0]'] = 4
+    monkeypatch.setattr(kafka_consumer, '_saga_consumer', saga_consumer)
+    try:
+        content = TestClient(main.app).get('/api/v1/health/metrics').json()
+    finally:
+        saga_consumer._lanes[0].shutdown()
+
+    assert content['kafka_consumer']['received'] == 3
+    assert content['kafka_consumer']['failed'] == 1
+    assert content['kafka_consumer']['lag'] == {'document-bot-success[0]': 4}
+
+def test_routes_create_the_vector_store_off_the_event_loop(store, monkeypatch):
+    from services.startup import Lazy
+    factory_threads = []
+
+    def create_store():
+        factory_threads.append(threading.current_thread().name)
+        return store
+
+    monkeypatch.setattr(main.documents, 'client', Lazy('vector store', create_store))
+    response = TestClient(main.app).get('/api/v1/collections/documents/1')
+
+    assert response.status_code == 404
+    assert len(factory_threads) == 1 and factory_threads[0].startswith('io-pool')
+
+def test_iterate_ranks_internal_projects_by_name_within_the_budget(store, monkeypatch):
+    import numpy as np
+    from tests.conftest import vector
+    projects = [(1, 'alpha', 10, 'INTERNAL', vector(1.0)), (2, 'beta', 10, 'INTERNAL', vector(0.0, 1.0)),
+                (3, 'alpha costly', 500, 'INTERNAL', vector(1.0)), (4, 'alpha external', 10, 'EXTERNAL', vector(1.0))]
+    store.insert_columns('projects', {
+        'id': [project[0] for project in projects], 'name': [project[1] for project in projects],
+        'description': ['description'] * len(projects), 'budget': [project[2] for project in projects],
+        'type': [project[3] for project in projects], 'name_emb': [project[4] for project in projects],
+        'descr_emb': [vector(1.0)] * len(projects)})
+    monkeypatch.setattr(main.projects, 'client', store)
+    monkeypatch.setattr(main.projects, 'embed_search', lambda name: np.array([vector(1.0)], dtype=np.float32))
+
+    response = TestClient(main.app).post('/api/v1/collections/projects/iterate', json={'name': 'alpha', 'budget': 100})
+
+    assert response.status_code == 200
+    assert [hit['entity']['name'] for hit in response.json()] == ['alpha', 'beta']
@@ -0,0 +1,36 @@
+import os
+
+import configs.env as env
+import numpy as np
+import pytest
+from schemas.collection_specs import SPECS
+from services.onnx_embedder import MODEL_FILE, QUANTIZED_MODEL_FILE, OnnxEmbedder, model_directory
+
+SAMPLE_SIZE = 64
+
+
+@pytest.fixture(scope='module')
+def sample():
+    spec = SPECS['projects']
+    if not os.path.exists(spec.file_path):
+        pytest.skip(f'{spec.file_path} is missing')
+    from schemas.validate_onnx import read_texts
+    return read_texts(spec, SAMPLE_SIZE)
+
+@pytest.fixture(scope='module')
+def reference(sample):
+    sentence_transformers = pytest.importorskip('sentence_transformers')
+    model = sentence_transformers.SentenceTransformer(env.EMBEDDING_MODEL_NAME, device='cpu')
+    return np.asarray(model.encode(sample), dtype=np.float32)
+
+@pytest.mark.parametrize('quantized, min_cosine', [(False, 0.999), (True, 0.98)])
+def test_onnx_embeddings_match_the_torch_model(sample, reference, quantized, min_cosine):
+    model_file = os.path.join(model_directory(env.ONNX_MODEL_DIR), QUANTIZED_MODEL_FILE if quantized else MODEL_FILE)
+    if not os.path.exists(model_file):
+        pytest.skip(f'{model_file} is missing, run schemas/export_onnx.py first')
+    from schemas.validate_onnx import cosine
+
+    embeddings = OnnxEmbedder.from_directory(env.ONNX_MODEL_DIR, quantized).encode(sample)
+
+    assert embeddings.shape == reference.shape
+    assert cosine(reference, np.asarray(embeddings, dtype=np.float32)).min() >= min_cosine
@@ -0,0 +1,65 @@
+import asyncio
+import os
+import time
+
+from services.report_service import ReportJobQueue
+
+
+async def build(search_term, path):
+    with open(path, 'wb') as file:
+        file.write(search_term.encode('utf-8'))
+    return path
+
+def age(path, seconds):
+    modified = time.time() - seconds
+    os.utime(path, (modified, modified))
+
+
+def test_polling_evicts_expired_reports(tmp_path):
+    async def scenario():
+        jobs = ReportJobQueue(build, str(tmp_path), workers=1, ttl=60, sweep_interval=3600)
+        job_id, _ = jobs.submit('term')
+        await jobs._queue.join()
+        assert jobs.poll(job_id) == 'done'
+
+        age(jobs.path(job_id), 120)
+        status = jobs.poll(job_id)
+        await jobs.close()
+        return jobs, job_id, status
+
+    jobs, job_id, status = asyncio.run(scenario())
+    assert status is None
+    assert not os.path.exists(jobs.path(job_id))
+    assert job_id not in jobs._jobs
+
+def test_sweeper_evicts_without_new_submissions(tmp_path):
+    async def scenario():
+        jobs = ReportJobQueue(build, str(tmp_path), workers=1, ttl=60, sweep_interval=0.01)
+        job_id, _ = jobs.submit('term')
+        await jobs._queue.join()
+        age(jobs.path(job_id), 120)
+        await asyncio.sleep(0.1)
+        await jobs.close()
+        return jobs, job_id
+
+    jobs, job_id = asyncio.run(scenario())
+    assert not os.path.exists(jobs.path(job_id))
+    assert job_id not in jobs._jobs
+
+def test_failed_jobs_are_forgotten_after_the_ttl(tmp_path):
+    async def failing(search_term, path):
+        raise RuntimeError('inference unavailable')
+
+    async def scenario():
+        jobs = ReportJobQueue(failing, str(tmp_path), workers=1, ttl=60, sweep_interval=3600)
+        job_id, _ = jobs.submit('term')
+        await jobs._queue.join()
+        failed = (jobs.poll(job_id), jobs.error(job_id))
+        jobs._jobs[job_id]['finished_at'] -= 120
+        expired = jobs.poll(job_id)
+        await jobs.close()
+        return failed, expired
+
+    failed, expired = asyncio.run(scenario())
+    assert failed == ('failed', 'inference unavailable')
+    assert expired is None
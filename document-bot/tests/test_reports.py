@@ -0,0 +1,122 @@
+import asyncio
+import json
+import os
+
+from routers import reports
+
+
+def test_stream_removes_the_report_when_the_client_disconnects(tmp_path, monkeypatch):
+    path = str(tmp_path / 'report.pdf')
+    monkeypatch.setattr(reports, 'report_path', lambda report_id: path)
+
+    async def create_pdf(search_term, path, progress=None):
+        await progress.put({'event': 'projects', 'count': 1})
+        with open(path, 'wb') as file:
+            file.write(b'%PDF')
+        await asyncio.sleep(10)
+        return path
+
+    async def disconnect_after_first_event():
+        monkeypatch.setattr(reports, 'create_pdf', create_pdf)
+        stream = reports.stream_report('term')
+        first = json.loads(await stream.__anext__())
+        await stream.aclose()
+        await asyncio.sleep(0.01)
+        return first
+
+    assert asyncio.run(disconnect_after_first_event()) == {'event': 'projects', 'count': 1}
+    assert not os.path.exists(path)
+
+def test_stream_keeps_the_report_once_the_download_was_announced(tmp_path, monkeypatch):
+    path = str(tmp_path / 'report.pdf')
+    monkeypatch.setattr(reports, 'report_path', lambda report_id: path)
+
+    async def create_pdf(search_term, path, progress=None):
+        with open(path, 'wb') as file:
+            file.write(b'%PDF')
+        return path
+
+    async def read_all():
+        monkeypatch.setattr(reports, 'create_pdf', create_pdf)
+        events = [json.loads(line) async for line in reports.stream_report('term')]
+        await asyncio.sleep(0.01)
+        return events
+
+    assert asyncio.run(read_all())[-1]['event'] == 'done'
+    assert os.path.exists(path)
+
+def test_stream_cancels_the_report_when_the_client_disconnects_mid_response(tmp_path, monkeypatch):
+    from fastapi import FastAPI
+    path = str(tmp_path / 'report.pdf')
+    monkeypatch.setattr(reports, 'report_path', lambda report_id: path)
+    monkeypatch.setattr(reports, 'REPORT_DISCONNECT_POLL_INTERVAL', 0.01)
+    cancelled = []
+
+    async def create_pdf(search_term, path, progress=None):
+        await progress.put({'event': 'projects', 'count': 1})
+        with open(path, 'wb') as file:
+            file.write(b'%PDF')
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(search_term)
+            raise
+        return path
+
+    async def serve_until_disconnect():
+        monkeypatch.setattr(reports, 'create_pdf', create_pdf)
+        app = FastAPI()
+        app.include_router(reports.router)
+        first_chunk = asyncio.Event()
+        requested = False
+        chunks = []
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await first_chunk.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.body' and message.get('body'):
+                chunks.append(json.loads(message['body']))
+                first_chunk.set()
+
+        scope = {'type': 'http', 'method': 'GET', 'path': '/api/v1/reports/stream', 'root_path': '',
+                 'query_string': b'search_term=term', 'headers': [], 'scheme': 'http', 'server': ('test', 80)}
+        await asyncio.wait_for(app(scope, receive, send), 5)
+        await asyncio.sleep(0.01)
+        return chunks
+
+    assert asyncio.run(serve_until_disconnect()) == [{'event': 'projects', 'count': 1}]
+    assert cancelled == ['term']
+    assert not os.path.exists(path)
+
+def test_stream_stops_once_the_request_reports_a_disconnect(tmp_path, monkeypatch):
+    path = str(tmp_path / 'report.pdf')
+    monkeypatch.setattr(reports, 'report_path', lambda report_id: path)
+    monkeypatch.setattr(reports, 'REPORT_DISCONNECT_POLL_INTERVAL', 0.01)
+
+    class DisconnectingRequest:
+        checks = 0
+
+        async def is_disconnected(self):
+            self.checks += 1
+            return self.checks > 2
+
+    async def create_pdf(search_term, path, progress=None):
+        with open(path, 'wb') as file:
+            file.write(b'%PDF')
+        await asyncio.sleep(10)
+        return path
+
+    async def read_all():
+        monkeypatch.setattr(reports, 'create_pdf', create_pdf)
+        events = [line async for line in reports.stream_report('term', DisconnectingRequest())]
+        await asyncio.sleep(0.01)
+        return events
+
+    assert asyncio.run(read_all()) == []
+    assert not os.path.exists(path)